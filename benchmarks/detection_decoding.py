@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""Compare decoding detector results with dataclasses_json and with the generated persistence codecs."""
+import timeit
+
+from dataclasses_json.core import _decode_dataclass
+
+from rosys import persistence
+from rosys.vision.detections import BoxDetection, PointDetection, SegmentationDetection
+
+NUMBER = 1_000
+
+RESULT = {
+    'box_detections': [
+        {'category_name': 'weed', 'model_name': 'm', 'confidence': 0.9, 'x': i, 'y': i, 'width': 10, 'height': 10}
+        for i in range(20)
+    ],
+    'point_detections': [
+        {'category_name': 'crop', 'model_name': 'm', 'confidence': 0.8, 'x': i, 'y': i}
+        for i in range(20)
+    ],
+    'segmentation_detections': [
+        {'category_name': 'row', 'model_name': 'm', 'confidence': 0.7, 'shape': {'points': [{'x': j, 'y': j} for j in range(20)]}}
+        for _ in range(5)
+    ],
+}
+
+
+def decode(convert) -> None:
+    [convert(BoxDetection, d) for d in RESULT['box_detections']]
+    [convert(PointDetection, d) for d in RESULT['point_detections']]
+    [convert(SegmentationDetection, d) for d in RESULT['segmentation_detections']]
+
+
+def main() -> None:
+    generic = min(timeit.repeat(lambda: decode(lambda cls, d: _decode_dataclass(cls, d, False)), number=NUMBER, repeat=3))
+    compiled = min(timeit.repeat(lambda: decode(persistence.from_dict), number=NUMBER, repeat=3))
+    print(f'dataclasses_json {generic / NUMBER * 1e6:8.1f} µs per result', flush=True)
+    print(f'generated codecs {compiled / NUMBER * 1e6:8.1f} µs per result ({generic / compiled:.0f}x faster)', flush=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""Compare building the yaw layers of an obstacle map for a 200 m x 200 m field in series and in parallel threads.
+
+The memory of the layers is compared with the compact representation.
+"""
+import os
+import time
+import uuid
+
+import numpy as np
+
+from rosys.geometry import Point
+from rosys.pathplanning import Area, Obstacle, obstacle_map
+from rosys.pathplanning.grid import Grid
+from rosys.pathplanning.obstacle_map import ObstacleMap
+
+SIZE = 200.0
+NUM_OBSTACLES = 100
+ROBOT_OUTLINE = [(-0.5, -0.4), (0.5, -0.4), (0.75, 0.0), (0.5, 0.4), (-0.5, 0.4)]
+
+
+def create_world() -> tuple[list[Area], list[Obstacle], Grid]:
+    rng = np.random.default_rng(42)
+    field = Area(id='field', outline=[Point(x=0, y=0), Point(x=SIZE, y=0), Point(x=SIZE, y=SIZE), Point(x=0, y=SIZE)])
+    obstacles = []
+    for x, y in rng.uniform(1, SIZE - 1, (NUM_OBSTACLES, 2)):
+        outline = [Point(x=x - 0.3, y=y - 0.3), Point(x=x + 0.3, y=y - 0.3),
+                   Point(x=x + 0.3, y=y + 0.3), Point(x=x - 0.3, y=y + 0.3)]
+        obstacles.append(Obstacle(id=str(uuid.uuid4()), outline=outline))
+    grid = Grid.from_points(field.outline, pixel_size=0.1, num_layers=36, padding=1.0)
+    return [field], obstacles, grid
+
+
+def measure(num_threads: int | None, areas: list[Area], obstacles: list[Obstacle], grid: Grid, *,
+            compact: bool = False) -> tuple[float, ObstacleMap]:
+    obstacle_map.NUM_THREADS = num_threads
+    start = time.perf_counter()
+    result = ObstacleMap.from_world(ROBOT_OUTLINE, areas, obstacles, grid, compact=compact)
+    return time.perf_counter() - start, result
+
+
+def memory(result: ObstacleMap) -> float:
+    arrays = [result.stack, result.dist_stack, result.packed_stack, result.quantized_dist_stack]
+    return sum(array.nbytes for array in arrays if array is not None) / 1e6
+
+
+def main() -> None:
+    areas, obstacles, grid = create_world()
+    print(f'grid: {grid.size[0]} x {grid.size[1]} cells, {grid.size[2]} layers, {os.cpu_count()} CPUs')
+    serial, _ = measure(1, areas, obstacles, grid)
+    print(f'serial:   {serial:6.2f} s')
+    parallel, parallel_map = measure(None, areas, obstacles, grid)
+    print(f'parallel: {parallel:6.2f} s ({serial / parallel:.1f}x), {memory(parallel_map):7.1f} MB')
+    del parallel_map
+    compact, compact_map = measure(None, areas, obstacles, grid, compact=True)
+    print(f'compact:  {compact:6.2f} s, {memory(compact_map):7.1f} MB')
+
+
+if __name__ == '__main__':
+    main()
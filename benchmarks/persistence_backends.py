@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""Compare write and restore times of the persistence backends for 10k obstacles."""
+import tempfile
+import time
+from pathlib import Path
+
+from dataclasses_json.core import _asdict, _decode_dataclass
+
+from rosys import persistence
+from rosys.geometry import Point
+from rosys.pathplanning import Obstacle
+from rosys.persistence.journal import Journal
+
+COUNT = 10_000
+
+
+def measure(label: str, function) -> None:
+    start = time.perf_counter()
+    function()
+    print(f'{label:<40} {(time.perf_counter() - start) * 1000:8.1f} ms', flush=True)
+
+
+def main() -> None:
+    obstacles = {
+        str(i): Obstacle(id=str(i), outline=[Point(x=i + dx, y=dy) for dx, dy in [(0, 0), (1, 0), (1, 1), (0, 1)]])
+        for i in range(COUNT)
+    }
+    data = {'obstacles': persistence.to_dict(obstacles)}
+
+    measure('to_dict (dataclasses_json)', lambda: _asdict(obstacles, False))
+    measure('to_dict (codec cache)', lambda: persistence.to_dict(obstacles))
+    measure('from_dict (dataclasses_json)',
+            lambda: {key: _decode_dataclass(Obstacle, value, False) for key, value in data['obstacles'].items()})
+    measure('from_dict (codec cache)',
+            lambda: persistence.replace_dict({}, Obstacle, data['obstacles']))
+
+    for backend in [persistence.JsonBackend(), persistence.FastJsonBackend(), persistence.MsgpackBackend()]:
+        name = type(backend).__name__
+        with tempfile.TemporaryDirectory() as directory:
+            journal = Journal(Path(directory) / 'obstacles.json', backend=backend)
+            measure(f'write ({name})', lambda: journal.write(data, compact=True))
+            measure(f'restore ({name})', lambda: Journal(journal.snapshot_path, backend=backend).read())
+            print(f'{"":<40} {journal.snapshot_path.stat().st_size / 1e6:8.1f} MB', flush=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""Compare pickled and shared memory transport of 5 MP frames to the process pool of `rosys.run`."""
+import asyncio
+import time
+
+import numpy as np
+
+from rosys import run
+
+REPETITIONS = 20
+FRAME = np.random.randint(0, 255, (1944, 2592, 3), dtype=np.uint8)  # NOTE: 5 MP frame
+JPEG = FRAME[::2, ::2].tobytes()  # NOTE: stand-in for roughly 4 MB of encoded data
+
+
+def checksum(data: bytes | memoryview | np.ndarray) -> int:
+    if isinstance(data, np.ndarray):
+        return int(data[::64, ::64].sum())
+    return int(np.frombuffer(data, dtype=np.uint8)[::4096].sum())  # NOTE: shared bytes arrive as memoryview
+
+
+def darken(frame: np.ndarray) -> np.ndarray:
+    return frame // 2
+
+
+async def measure(label: str, function, *args) -> None:
+    await function(*args)  # NOTE: warm up worker processes and shared memory blocks
+    t = time.perf_counter()
+    for _ in range(REPETITIONS):
+        await function(*args)
+    print(f'{label:<40} {(time.perf_counter() - t) / REPETITIONS * 1000:8.2f} ms', flush=True)
+
+
+async def main() -> None:
+    for label, callback, payload in [
+        ('ndarray argument', checksum, FRAME),
+        ('bytes argument', checksum, JPEG),
+        ('ndarray argument and result', darken, FRAME),
+    ]:
+        await measure(f'{label} (pickled)', run.cpu_bound, callback, payload)
+        await measure(f'{label} (shared memory)', run.cpu_bound_shared, callback, payload)
+    run.tear_down()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
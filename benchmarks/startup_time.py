@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""Measure the cost of `import rosys` and `rosys.startup()` in fresh interpreters."""
+import statistics
+import subprocess
+import sys
+
+REPETITIONS = 5
+HEAVY_MODULES = ['cv2', 'scipy', 'networkx', 'matplotlib', 'socketio', 'pyudev', 'PIL', 'line_profiler']
+
+SCRIPT = f'''
+import asyncio
+import multiprocessing
+import sys
+import time
+
+multiprocessing.set_start_method('spawn', force=True)
+t = time.perf_counter()
+import rosys
+import_time = time.perf_counter() - t
+loaded = [name for name in {HEAVY_MODULES!r} if name in sys.modules]
+
+async def startup() -> float:
+    t = time.perf_counter()
+    await rosys.startup()
+    return time.perf_counter() - t
+
+startup_time = asyncio.run(startup())
+print(import_time, startup_time, ','.join(loaded))
+'''
+
+
+def main() -> None:
+    import_times: list[float] = []
+    startup_times: list[float] = []
+    loaded = ''
+    for _ in range(REPETITIONS):
+        output = subprocess.run([sys.executable, '-c', SCRIPT], capture_output=True, text=True, check=True).stdout
+        import_time, startup_time, loaded = (output.splitlines()[-1].split(' ') + [''])[:3]
+        import_times.append(float(import_time))
+        startup_times.append(float(startup_time))
+    print(f'import rosys:    {statistics.median(import_times) * 1000:8.1f} ms (median of {REPETITIONS})')
+    print(f'rosys.startup(): {statistics.median(startup_times) * 1000:8.1f} ms (median of {REPETITIONS})')
+    print(f'heavy modules loaded by "import rosys": {loaded or "none"}')
+
+
+if __name__ == '__main__':
+    main()
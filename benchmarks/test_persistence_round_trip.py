@@ -0,0 +1,180 @@
+"""Benchmark of the full persistence round trip on realistic data.
+
+Run with `pytest -s benchmarks/test_persistence_round_trip.py`.
+The stages are backup, write (full snapshot), incremental (journal append after a small change), read and restore.
+Every stage is compared against the stored baselines in `persistence_baselines.json` and fails if it got considerably slower.
+The baselines are stored relative to a fixed calibration workload, so they can be compared across machines.
+Set `ROSYS_UPDATE_BASELINES=1` to store the current timings as new baselines.
+Additionally, the test fails if a backend writes or reads considerably slower than the default `JsonBackend`
+or if incremental writes are not faster than writing a full snapshot.
+"""
+import itertools
+import json
+import os
+import time
+from pathlib import Path
+from typing import Any, Callable
+
+import pytest
+
+from rosys import persistence
+from rosys.analysis import KpiLogger
+from rosys.analysis.kpi_buckets import Day
+from rosys.geometry import Point
+from rosys.pathplanning import Area
+from rosys.persistence.journal import Journal
+
+BASELINES_PATH = Path(__file__).parent / 'persistence_baselines.json'
+TOLERANCE = float(os.environ.get('ROSYS_BENCHMARK_TOLERANCE', 2.0))
+UPDATE = os.environ.get('ROSYS_UPDATE_BASELINES') == '1'
+REPEAT = 3
+BACKEND_STAGES = ['write', 'incremental', 'read']
+"""stages which are compared with the `JsonBackend`"""
+
+
+class Areas(persistence.PersistentModule):
+    USE_PERSISTENCE = False
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.areas: dict[str, Area] = {}
+
+    def backup(self) -> dict[str, Any]:
+        return {'areas': persistence.to_dict(self.areas)}
+
+    def restore(self, data: dict[str, Any]) -> None:
+        persistence.replace_dict(self.areas, Area, data.get('areas', {}))
+
+
+class Cameras(persistence.PersistentModule):
+    USE_PERSISTENCE = False
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.cameras: dict[str, dict[str, Any]] = {}
+
+    def backup(self) -> dict[str, Any]:
+        return {'cameras': dict(self.cameras)}
+
+    def restore(self, data: dict[str, Any]) -> None:
+        self.cameras = dict(data.get('cameras', {}))
+
+
+def create_areas() -> persistence.PersistentModule:
+    module = Areas()
+    for i in range(1_000):
+        outline = [Point(x=i + 0.01 * j, y=(j % 17) * 0.1) for j in range(100)]
+        module.areas[str(i)] = Area(id=str(i), outline=outline, type='field', color='green')
+    return module
+
+
+def create_kpis() -> persistence.PersistentModule:
+    module = KpiLogger()
+    module.days = [
+        Day(date=f'2024-{1 + i // 28:02d}-{1 + i % 28:02d}', incidents={f'incident_{k}': i * k for k in range(50)})
+        for i in range(4 * 28)
+    ]
+    module.backup()  # NOTE: pack old days into months once
+    return module
+
+
+def create_cameras() -> persistence.PersistentModule:
+    module = Cameras()
+    for i in range(500):
+        module.cameras[f'camera-{i}'] = {
+            'id': f'camera-{i}', 'name': f'Camera {i}', 'connect_after_init': True, 'streaming': True,
+            'url': f'http://192.168.0.{i % 255}/video', 'username': 'root', 'password': 'secret',
+            'fps': 10, 'resolution': [1920, 1080], 'mirrored': False, 'rotation': 0,
+        }
+    return module
+
+
+DATASETS: dict[str, Callable[[], persistence.PersistentModule]] = {
+    'areas': create_areas,
+    'kpis': create_kpis,
+    'cameras': create_cameras,
+}
+BACKENDS = [persistence.JsonBackend, persistence.FastJsonBackend, persistence.MsgpackBackend]
+
+
+def measure(function: Callable[[], Any]) -> float:
+    durations = []
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        function()
+        durations.append(time.perf_counter() - start)
+    return min(durations)
+
+
+@pytest.fixture(scope='module')
+def calibration() -> float:
+    """Duration of a fixed serialization workload which the timings are divided by."""
+    data = [{'x': i * 0.5, 'name': f'item {i}', 'tags': list(range(10))} for i in range(10_000)]
+    return measure(lambda: json.loads(json.dumps(data)))
+
+
+@pytest.fixture(scope='module')
+def baselines():
+    baselines = json.loads(BASELINES_PATH.read_text()) if BASELINES_PATH.exists() else {}
+    yield baselines
+    if UPDATE:
+        BASELINES_PATH.write_text(json.dumps(baselines, indent=4, sort_keys=True) + '\n')
+
+
+def change(data: dict[str, Any], revision: int) -> None:
+    """Replace the first entry of the first non-empty container, like a single edited area or KPI day."""
+    container = next(value for value in data.values() if isinstance(value, (dict, list)) and value)
+    container[next(iter(container)) if isinstance(container, dict) else 0] = {'revision': revision}
+
+
+def measure_backend(dataset: str, backend: type[persistence.Backend], path: Path) -> dict[str, float]:
+    module = DATASETS[dataset]()
+    data = module.backup()
+    journal = Journal(path / f'{dataset}.json', backend=backend())
+    timings = {
+        'backup': measure(module.backup),
+        'write': measure(lambda: journal.write(data, compact=True)),
+        'read': measure(lambda: Journal(journal.snapshot_path, backend=backend()).read()),
+        'restore': measure(lambda: module.restore(data)),
+    }
+    assert module.backup() == data, 'the round trip should not change the data'
+
+    revisions = itertools.count()
+
+    def write_change() -> None:
+        change(data, next(revisions))
+        journal.write(data)
+    timings['incremental'] = measure(write_change)
+    assert journal.entry_count > 0, 'changes should have been appended to the journal'
+    assert Journal(journal.snapshot_path, backend=backend()).read() == json.loads(json.dumps(data))
+    return timings
+
+
+@pytest.mark.parametrize('dataset', DATASETS)
+def test_round_trip(dataset: str, tmp_path: Path, calibration: float, baselines: dict[str, float]) -> None:
+    timings: dict[str, dict[str, float]] = {}
+    for backend in BACKENDS:
+        path = tmp_path / backend.__name__  # NOTE: both JSON backends use the same suffix
+        path.mkdir()
+        timings[backend.__name__] = measure_backend(dataset, backend, path)
+
+    regressions = []
+    reference = timings[persistence.JsonBackend.__name__]
+    slack = 0.005 / calibration  # NOTE: very short stages are dominated by noise
+    for name, stages in timings.items():
+        for stage, seconds in stages.items():
+            key = f'{dataset}/{name}/{stage}'
+            ratio = seconds / calibration
+            print(f'{key:<40} {seconds * 1000:8.1f} ms {ratio:8.3f} x calibration')
+            if UPDATE:
+                baselines[key] = round(ratio, 4)
+            elif key in baselines and ratio > baselines[key] * TOLERANCE + slack:
+                regressions.append(f'{key}: {ratio:.3f} x calibration (baseline {baselines[key]:.3f})')
+        for stage in BACKEND_STAGES:
+            if stages[stage] > reference[stage] * TOLERANCE + 0.005:
+                regressions.append(f'{name}/{stage}: {stages[stage] * 1000:.1f} ms (JSON {reference[stage] * 1000:.1f} ms)')
+        if stages['incremental'] > stages['write'] + 0.005:
+            regressions.append(f'{name}/incremental: {stages["incremental"] * 1000:.1f} ms '
+                               f'(full snapshot {stages["write"] * 1000:.1f} ms)')
+    print(f'calibration: {calibration * 1000:.1f} ms')
+    assert not regressions, f'performance regression in {dataset}: ' + ', '.join(regressions)
@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+"""Measure the cost of a single `rosys.time()` call, also while other threads read the time concurrently."""
+import threading
+import time
+import timeit
+
+import rosys
+
+NUMBER = 1_000_000
+THREADS = 4
+
+
+def measure(label: str, function=rosys.time) -> None:
+    seconds = min(timeit.repeat(function, number=NUMBER, repeat=5))
+    print(f'{label:<40} {seconds / NUMBER * 1e9:8.1f} ns per call', flush=True)
+
+
+def main() -> None:
+    measure('time.monotonic() (reference)', time.monotonic)
+    measure('rosys.time()')
+
+    stopped = threading.Event()
+
+    def read() -> None:
+        while not stopped.is_set():
+            rosys.time()
+    threads = [threading.Thread(target=read) for _ in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    measure(f'rosys.time() with {THREADS} concurrent readers')
+    stopped.set()
+    for thread in threads:
+        thread.join()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,12 +1,34 @@
+import importlib
+from typing import TYPE_CHECKING, Any
+
 from nicegui import background_tasks
 
-from . import analysis, automation, driving, event, geometry, hardware, pathplanning, persistence, run, system, vision
+from . import event, persistence, run
 from .config import Config
-from .rosys import (NEW_NOTIFICATION, Notification, config, is_test, notify, on_repeat, on_shutdown, on_startup,
-                    reset_after_test, reset_before_test, set_time, shutdown, sleep, startup, time, translator, uptime)
-from .simulation_ui import simulation_ui
+from .rosys import (NEW_NOTIFICATION, Notification, Repeater, RepeaterStats, config, is_test, notify, on_repeat,
+                    on_shutdown, on_startup, reset_after_test, reset_before_test, set_time, shutdown, sleep, startup,
+                    time, translator, uptime)
 from .version import __version__
 
+if TYPE_CHECKING:
+    from . import analysis, automation, driving, geometry, hardware, pathplanning, system, vision
+    from .simulation_ui import simulation_ui
+
+# NOTE: subpackages pull in heavy dependencies like cv2, scipy, networkx and matplotlib, so they are imported on first access
+_LAZY_MODULES = {
+    'analysis': '.analysis',
+    'automation': '.automation',
+    'driving': '.driving',
+    'geometry': '.geometry',
+    'hardware': '.hardware',
+    'pathplanning': '.pathplanning',
+    'system': '.system',
+    'vision': '.vision',
+}
+_LAZY_ATTRIBUTES = {
+    'simulation_ui': '.simulation_ui',
+}
+
 __all__ = [
     'background_tasks',
     'analysis',
@@ -23,6 +45,8 @@ __all__ = [
     'Config',
     'NEW_NOTIFICATION',
     'Notification',
+    'Repeater',
+    'RepeaterStats',
     'config',
     'is_test',
     'notify',
@@ -41,3 +65,17 @@ __all__ = [
     'simulation_ui',
     '__version__',
 ]
+
+
+def __getattr__(name: str) -> Any:
+    if name in _LAZY_MODULES:
+        return importlib.import_module(_LAZY_MODULES[name], __name__)
+    if name in _LAZY_ATTRIBUTES:
+        value = getattr(importlib.import_module(_LAZY_ATTRIBUTES[name], __name__), name)
+        globals()[name] = value  # NOTE: importing the module has bound its name to the module itself
+        return value
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+
+def __dir__() -> list[str]:
+    return sorted(set(globals()) | set(__all__))
@@ -1,4 +1,5 @@
 from .asyncio_warnings import AsyncioWarnings
+from .events_page_ import EventsPage as events_page
 from .kpi_buckets import Day, Month, TimeBucket, Week
 from .kpi_chart import KpiChart
 from .kpi_logger import KpiLogger, date_to_str, str_to_date
@@ -7,6 +8,7 @@ from .legacy.asyncio_monitor import AsyncioMonitor
 from .legacy.network_monitor import NetworkMonitor, NetworkStats
 from .legacy.objgraph_page import objgraph_page
 from .logging_page import LoggingPage as logging_page
+from .loop_monitor import LoopMonitor, Stall
 from .memory import MemoryMiddleware
 from .profile_button_ import ProfileButton as profile_button
 from .timelapse_recorder import TimelapseRecorder
@@ -15,6 +17,7 @@ from .videos_page_ import VideosPage as videos_page
 
 __all__ = [
     'AsyncioWarnings',
+    'events_page',
     'Day',
     'Month',
     'TimeBucket',
@@ -29,6 +32,8 @@ __all__ = [
     'NetworkStats',
     'objgraph_page',
     'logging_page',
+    'LoopMonitor',
+    'Stall',
     'MemoryMiddleware',
     'profile_button',
     'TimelapseRecorder',
@@ -0,0 +1,52 @@
+from nicegui import ui
+
+from .. import event
+
+DURATION_LABELS = [f'≤{bound * 1000:g} ms' for bound in event.DURATION_BUCKETS] + \
+    [f'>{event.DURATION_BUCKETS[-1] * 1000:g} ms']
+
+
+class EventsPage:
+    """Events Page
+
+    This module creates a page showing dispatch statistics of all event listeners, slowest first.
+    Collecting the statistics can be switched on and off on the page (see `rosys.event.instrumented`).
+    It is mounted at /events.
+    """
+
+    def __init__(self) -> None:
+        @ui.page('/events', title='Events')
+        def page():
+            columns = [
+                {'name': 'event', 'label': 'Event', 'field': 'event', 'align': 'left'},
+                {'name': 'listener', 'label': 'Listener', 'field': 'listener', 'align': 'left'},
+                {'name': 'emits', 'label': 'Emits', 'field': 'emits'},
+                {'name': 'calls', 'label': 'Calls', 'field': 'calls'},
+                {'name': 'exceptions', 'label': 'Exceptions', 'field': 'exceptions'},
+                {'name': 'dropped', 'label': 'Dropped', 'field': 'dropped'},
+                {'name': 'sync', 'label': 'Sync [ms]', 'field': 'sync'},
+                {'name': 'max_sync', 'label': 'Max sync [ms]', 'field': 'max_sync'},
+                {'name': 'async', 'label': 'Async [ms]', 'field': 'async'},
+                {'name': 'histogram', 'label': ' | '.join(DURATION_LABELS), 'field': 'histogram'},
+            ]
+
+            def update() -> None:
+                table.rows[:] = [{
+                    'id': f'{i}',
+                    'event': e.origin,
+                    'listener': f'{l.filepath}:{l.line}',
+                    'emits': e.emits,
+                    'calls': l.stats.calls,
+                    'exceptions': l.stats.exceptions,
+                    'dropped': l.dropped,
+                    'sync': f'{l.stats.sync_time * 1000:.1f}',
+                    'max_sync': f'{l.stats.max_sync_time * 1000:.1f}',
+                    'async': f'{l.stats.async_time * 1000:.1f}',
+                    'histogram': ' | '.join(str(count) for count in l.stats.histogram),
+                } for i, (e, l) in enumerate(event.get_stats())]
+                table.update()
+
+            ui.switch('collect statistics', value=event.instrumented,
+                      on_change=lambda e: setattr(event, 'instrumented', e.value))
+            table = ui.table(columns=columns, rows=[], row_key='id').classes('w-full')
+            ui.timer(1.0, update)
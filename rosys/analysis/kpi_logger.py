@@ -19,6 +19,8 @@ def str_to_date(date_: str) -> datetime:
 
 
 class KpiLogger(persistence.PersistentModule):
+    LAZY_RESTORE = True  # NOTE: the history is not needed for booting
+    BACKUP_INTERVAL = 60.0  # NOTE: incidents are counted often but losing the last minute is acceptable
 
     def __init__(self) -> None:
         super().__init__()
@@ -51,6 +53,7 @@ class KpiLogger(persistence.PersistentModule):
             self.request_backup()
 
     def today(self) -> Day:
+        self.ensure_restored()
         date_ = date_to_str(datetime.utcfromtimestamp(rosys.time()).date())
         if not self.days or self.days[-1].date != date_:
             self.days.append(Day(date=date_))
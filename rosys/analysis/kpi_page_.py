@@ -39,6 +39,7 @@ class kpi_page(ABC):
             ui.timer(5, lambda: show(toggle.value))
 
             def show(num_days: int) -> None:
+                kpi_logger.ensure_restored()
                 time_buckets: Sequence[TimeBucket]
                 if num_days <= 7:
                     time_buckets = kpi_logger.days[-num_days:]
@@ -0,0 +1,147 @@
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from collections import defaultdict, deque
+from dataclasses import dataclass
+from typing import Optional
+
+from nicegui import ui
+
+from .. import rosys
+
+
+@dataclass(slots=True, kw_only=True)
+class Stall:
+    time: float
+    duration: float
+    task: str
+    stack: list[str]
+
+
+class LoopMonitor:
+    """Low-overhead monitor of the event loop which works without asyncio debug mode.
+
+    A probe coroutine measures the loop lag with a high frequency.
+    A watchdog thread samples which task is currently running to estimate the run time per task
+    and captures the stack of the loop thread whenever the loop is blocked for longer than the threshold.
+    The monitor is started and stopped explicitly, e.g. with `rosys.on_startup(monitor.start)` and `rosys.on_shutdown(monitor.stop)`.
+    """
+    IDLE = '<idle>'
+
+    def __init__(self, *,
+                 threshold: float = 0.1,
+                 probe_interval: float = 0.01,
+                 sample_interval: float = 0.005,
+                 max_stalls: int = 100) -> None:
+        self.log = logging.getLogger('rosys.loop_monitor')
+        self.threshold = threshold
+        self.probe_interval = probe_interval
+        self.sample_interval = sample_interval
+
+        self.lags: deque[float] = deque(maxlen=1000)
+        self.max_lag = 0.0
+        self.task_times: defaultdict[str, float] = defaultdict(float)
+        """estimated run time per task in seconds (based on sampling)"""
+        self.stalls: deque[Stall] = deque(maxlen=max_stalls)
+
+        self._heartbeat = time.perf_counter()
+        self._probe: Optional[asyncio.Task] = None
+        self._watcher: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+        self._current_stall: Optional[Stall] = None
+        self.stall_count = 0
+
+    @property
+    def mean_lag(self) -> float:
+        return sum(self.lags) / len(self.lags) if self.lags else 0.0
+
+    def start(self) -> None:
+        if self._probe is not None:
+            return
+        if self._watcher is not None:
+            self._watcher.join()  # NOTE: the watcher of a previous run might not have noticed the stop yet
+        self._heartbeat = time.perf_counter()
+        self._stopped.clear()
+        self._probe = rosys.background_tasks.create(self._run_probe(), name='loop monitor probe')
+        self._watcher = threading.Thread(target=self._watch, args=(asyncio.get_running_loop(), threading.get_ident()),
+                                         name='rosys loop monitor', daemon=True)
+        self._watcher.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        if self._probe is not None:
+            self._probe.cancel()
+            self._probe = None
+
+    def top_tasks(self, count: int = 10) -> list[tuple[str, float]]:
+        tasks = [(name, seconds) for name, seconds in self.task_times.items() if name != self.IDLE]
+        return sorted(tasks, key=lambda item: item[1], reverse=True)[:count]
+
+    async def _run_probe(self) -> None:
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.probe_interval)
+            self._heartbeat = time.perf_counter()
+            lag = max(self._heartbeat - start - self.probe_interval, 0.0)
+            self.lags.append(lag)
+            self.max_lag = max(self.max_lag, lag)
+
+    def _watch(self, loop: asyncio.AbstractEventLoop, loop_thread_id: int) -> None:
+        while not self._stopped.wait(self.sample_interval):
+            task = asyncio.current_task(loop)
+            name = self._describe(task) if task else self.IDLE
+            self.task_times[name] += self.sample_interval
+            blocked = time.perf_counter() - self._heartbeat
+            if blocked < self.threshold:
+                self._current_stall = None
+            elif self._current_stall is None:
+                frame = sys._current_frames().get(loop_thread_id)  # pylint: disable=protected-access
+                stack = traceback.format_stack(frame) if frame else []
+                self._current_stall = Stall(time=time.time(), duration=blocked, task=name, stack=stack)
+                self.stalls.append(self._current_stall)
+                self.stall_count += 1
+                self.log.warning('event loop is blocked by %s', name)
+            else:
+                self._current_stall.duration = blocked
+
+    @staticmethod
+    def _describe(task: asyncio.Task) -> str:
+        name = task.get_name()
+        if name.startswith('Task-'):  # NOTE: use the coroutine name for anonymous tasks
+            coro = task.get_coro()
+            return getattr(coro, '__qualname__', repr(coro))
+        return name
+
+    def ui(self) -> ui.element:
+        with ui.column() as content:
+            lag_label = ui.label()
+            columns = [
+                {'name': 'task', 'label': 'Task', 'field': 'task', 'align': 'left'},
+                {'name': 'seconds', 'label': 'Run time [s]', 'field': 'seconds'},
+            ]
+            tasks_table = ui.table(columns=columns, rows=[], row_key='task').classes('w-full')
+
+            @ui.refreshable
+            def stalls() -> None:
+                for stall in reversed(self.stalls):
+                    with ui.expansion(f'{time.strftime("%H:%M:%S", time.localtime(stall.time))}: '
+                                      f'{stall.task} blocked the loop for {stall.duration * 1000:.0f} ms'):
+                        ui.code(''.join(stall.stack)).classes('w-full')
+
+            shown_stalls = self.stall_count
+
+            def update() -> None:
+                nonlocal shown_stalls
+                lag_label.set_text(f'loop lag: {self.mean_lag * 1000:.1f} ms (mean), {self.max_lag * 1000:.1f} ms (max)')
+                tasks_table.rows[:] = [{'task': name, 'seconds': f'{seconds:.2f}'} for name, seconds in self.top_tasks()]
+                tasks_table.update()
+                if shown_stalls != self.stall_count:
+                    shown_stalls = self.stall_count
+                    stalls.refresh()
+
+            stalls()
+            ui.timer(1.0, update)
+        return content
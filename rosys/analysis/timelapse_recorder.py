@@ -61,11 +61,14 @@ class TimelapseRecorder:
 
     async def save(self, image: RosysImage) -> None:
         """Captures an image to be used in video."""
-        await rosys.run.cpu_bound(_save_image,
-                                  image,
-                                  STORAGE_PATH,
-                                  (self.width, self.height),
-                                  self._notifications.pop(0) if self._notifications else [])
+        assert image.data is not None
+        await rosys.run.cpu_bound_shared(_save_image,
+                                         image.data,
+                                         image.time,
+                                         image.camera_id,
+                                         STORAGE_PATH,
+                                         (self.width, self.height),
+                                         self._notifications.pop(0) if self._notifications else [])
 
     async def compress_video(self) -> None:
         """Creates a video from the captured images"""
@@ -114,17 +117,17 @@ class TimelapseRecorder:
             self._notifications[i].append(message)
 
 
-def _save_image(image: RosysImage, path: Path, size: tuple[int, int], notifications: list[str]) -> None:
-    assert image.data is not None
-    img = Image.open(io.BytesIO(image.data))
+def _save_image(data: bytes, time: float, camera_id: str,
+                path: Path, size: tuple[int, int], notifications: list[str]) -> None:
+    img = Image.open(io.BytesIO(data))
     img = img.resize(size)
     draw = ImageDraw.Draw(img)
     x = y = 20
-    _write(f'{datetime.fromtimestamp(image.time):%Y-%m-%d %H:%M:%S}, cam {image.camera_id}', draw, x, y)
+    _write(f'{datetime.fromtimestamp(time):%Y-%m-%d %H:%M:%S}, cam {camera_id}', draw, x, y)
     for message in notifications:
         y += 30
         _write(message, draw, x, y)
-    img.save(path / f'{image.time:.3f}.jpg', 'JPEG')
+    img.save(path / f'{time:.3f}.jpg', 'JPEG')
 
 
 def _write(text: str, draw: ImageDraw.ImageDraw, x: int, y: int) -> None:
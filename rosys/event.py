@@ -1,19 +1,48 @@
 from __future__ import annotations
 
 import asyncio
+import bisect
 import inspect
 import logging
-from dataclasses import dataclass
-from typing import Awaitable, Callable
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Literal
 
 from nicegui import background_tasks, context, core
 
 from .helpers import invoke
 
 startup_coroutines: list[Awaitable] = []
-tasks: list[asyncio.Task] = []
+tasks: set[asyncio.Task] = set()
+task_exception_handlers: list[Callable[[BaseException], None]] = []
 log = logging.getLogger('rosys.event')
 events: list[Event] = []
+instrumented = False  # NOTE: set to True to collect dispatch statistics for all events and listeners
+
+Delivery = Literal['task', 'latest', 'queue', 'batch']
+
+DURATION_BUCKETS = (0.001, 0.01, 0.1, 1.0, 10.0)
+"""upper bounds of the async duration histogram in seconds (the last bucket collects all longer durations)"""
+
+
+@dataclass(slots=True, kw_only=True)
+class ListenerStats:
+    calls: int = 0
+    exceptions: int = 0
+    sync_time: float = 0.0
+    max_sync_time: float = 0.0
+    async_time: float = 0.0
+    histogram: list[int] = field(default_factory=lambda: [0] * (len(DURATION_BUCKETS) + 1))
+
+    def add_sync_time(self, duration: float) -> None:
+        self.calls += 1
+        self.sync_time += duration
+        self.max_sync_time = max(self.max_sync_time, duration)
+
+    def add_async_time(self, duration: float) -> None:
+        self.async_time += duration
+        self.histogram[bisect.bisect_left(DURATION_BUCKETS, duration)] += 1
 
 
 @dataclass(slots=True, kw_only=True)
@@ -21,15 +50,36 @@ class EventListener:
     callback: Callable
     filepath: str
     line: int
+    delivery: Delivery = 'task'
+    pending: deque[tuple] = field(default_factory=deque)
+    busy: bool = False
+    dropped: int = 0
+    stats: ListenerStats = field(default_factory=ListenerStats)
 
 
 class Event:
 
     def __init__(self) -> None:
         self.listeners: list[EventListener] = []
+        self.emits = 0
+        frame = inspect.currentframe()
+        assert frame is not None
+        frame = frame.f_back
+        assert frame is not None
+        self.origin = f'{frame.f_code.co_filename}:{frame.f_lineno}'
         events.append(self)
 
-    def register(self, callback: Callable) -> Event:
+    def register(self, callback: Callable, *, delivery: Delivery = 'task', maxlen: int = 10) -> Event:
+        """Register a listener which is called whenever the event is emitted.
+
+        The delivery policy determines how emits are handled while an earlier call of the listener is still running:
+
+        - "task": every emit calls the listener immediately (async listeners get their own background task)
+        - "latest": only the latest arguments are kept and delivered once the listener is free again
+        - "queue": up to `maxlen` arguments are queued and delivered one after another; the oldest ones are dropped
+        - "batch": the listener is called with a list of all arguments emitted since the last call (at most `maxlen`);
+          events with multiple arguments are delivered as tuples
+        """
         if not callable(callback):
             raise ValueError('non-callable callback')
         if any(l.callback == callback for l in self.listeners):
@@ -38,11 +88,15 @@ class Event:
         assert frame is not None
         frame = frame.f_back
         assert frame is not None
-        self.listeners.append(EventListener(callback=callback, filepath=frame.f_code.co_filename, line=frame.f_lineno))
+        self.listeners.append(EventListener(callback=callback,
+                                            filepath=frame.f_code.co_filename,
+                                            line=frame.f_lineno,
+                                            delivery=delivery,
+                                            pending=deque(maxlen=1 if delivery == 'latest' else maxlen)))
         return self
 
-    def register_ui(self, callback: Callable) -> Event:
-        self.register(callback)
+    def register_ui(self, callback: Callable, *, delivery: Delivery = 'task', maxlen: int = 10) -> Event:
+        self.register(callback, delivery=delivery, maxlen=maxlen)
         client = context.client
         if not client.shared:
             async def register_disconnect():
@@ -68,22 +122,104 @@ class Event:
 
     def emit(self, *args) -> None:
         """Fires event without waiting for the result."""
+        if instrumented:
+            self.emits += 1
         for listener in self.listeners:
             try:
-                result = listener.callback(*args)
-                if isinstance(result, Awaitable):
-                    if core.loop and core.loop.is_running():
-                        name = f'{listener.filepath}:{listener.line}'
-                        tasks.append(background_tasks.create(result, name=name))
+                if listener.delivery == 'task':
+                    if instrumented:
+                        start = time.perf_counter()
+                        try:
+                            result = listener.callback(*args)
+                        except Exception:
+                            listener.stats.exceptions += 1
+                            raise
+                        finally:
+                            listener.stats.add_sync_time(time.perf_counter() - start)
+                        if isinstance(result, Awaitable):
+                            result = self._measure(listener, result)
                     else:
-                        startup_coroutines.append(result)
+                        result = listener.callback(*args)
+                    if isinstance(result, Awaitable):
+                        self._schedule(listener, result)
+                else:
+                    self._enqueue(listener, args)
             except Exception:
                 log.exception('could not emit listener=%s', listener)
 
+    @staticmethod
+    async def _measure(listener: EventListener, awaitable: Awaitable) -> Any:
+        start = time.perf_counter()
+        try:
+            return await awaitable
+        except Exception:
+            listener.stats.exceptions += 1
+            raise
+        finally:
+            listener.stats.add_async_time(time.perf_counter() - start)
+
+    def _schedule(self, listener: EventListener, coroutine: Any) -> None:
+        if core.loop and core.loop.is_running():
+            name = f'{listener.filepath}:{listener.line}'
+            task = background_tasks.create(coroutine, name=name)
+            tasks.add(task)
+            task.add_done_callback(_handle_task_done)
+        else:
+            startup_coroutines.append(coroutine)
+
+    def _enqueue(self, listener: EventListener, args: tuple) -> None:
+        if len(listener.pending) == listener.pending.maxlen:
+            listener.dropped += 1
+        listener.pending.append(args)
+        if not listener.busy:
+            listener.busy = True
+            self._schedule(listener, self._drain(listener))
+
+    @staticmethod
+    async def _drain(listener: EventListener) -> None:
+        try:
+            while listener.pending:
+                if listener.delivery == 'batch':
+                    args = ([entry[0] if len(entry) == 1 else entry for entry in listener.pending],)
+                    listener.pending.clear()
+                else:
+                    args = listener.pending.popleft()
+                try:
+                    if instrumented:
+                        listener.stats.calls += 1
+                        await Event._measure(listener, invoke(listener.callback, *args))
+                    else:
+                        await invoke(listener.callback, *args)
+                except Exception as e:
+                    # NOTE: a failing call must not leave the remaining pending calls queued
+                    log.exception('could not call listener=%s', listener)
+                    for handler in task_exception_handlers:
+                        handler(e)
+        finally:
+            listener.busy = False
+
+
+def _handle_task_done(task: asyncio.Task) -> None:
+    tasks.discard(task)
+    if task.cancelled():
+        return
+    exception = task.exception()
+    if exception is None:
+        return
+    log.exception('task failed to execute', exc_info=exception)
+    for handler in task_exception_handlers:
+        handler(exception)
+
+
+def get_stats() -> list[tuple[Event, EventListener]]:
+    """All listeners of all events, ordered by the total time they spent (synchronously and asynchronously)."""
+    pairs = [(event, listener) for event in events for listener in event.listeners]
+    return sorted(pairs, key=lambda pair: pair[1].stats.sync_time + pair[1].stats.async_time, reverse=True)
+
 
 def reset() -> None:
     for event in events:
         event.listeners.clear()
-    for task in tasks:
+    for task in list(tasks):
         task.cancel()
     tasks.clear()
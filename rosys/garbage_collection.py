@@ -0,0 +1,128 @@
+import asyncio
+import gc
+import logging
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+import psutil
+
+log = logging.getLogger('rosys.garbage_collection')
+
+
+@dataclass(slots=True, kw_only=True)
+class CollectionStats:
+    count: int = 0
+    total_pause: float = 0.0
+    max_pause: float = 0.0
+    last_pause: float = 0.0
+
+    def add(self, pause: float) -> None:
+        self.count += 1
+        self.total_pause += pause
+        self.max_pause = max(self.max_pause, pause)
+        self.last_pause = pause
+
+
+class GarbageCollector:
+    """Runs garbage collections in short slices while the event loop is idle.
+
+    The automatic garbage collection of Python is disabled because it can kick in at any time (e.g. while driving).
+    Instead, the `step` method is called regularly and collects the young generations whenever the event loop is idle.
+    Full collections are only done if the free memory gets low or the process has grown significantly since the last one.
+    If the loop stays busy, pending collections are done anyway after `max_delay` seconds.
+    """
+
+    def __init__(self, *,
+                 idle_lag: float = 0.002,
+                 pause_budget: float = 0.005,
+                 mbyte_limit: float = 300,
+                 mbyte_growth_limit: float = 200,
+                 memory_check_interval: float = 1.0,
+                 max_delay: float = 10.0) -> None:
+        self.idle_lag = idle_lag
+        """the loop is considered idle if a probe is scheduled within this many seconds"""
+        self.pause_budget = pause_budget
+        """maximum pause in seconds which a young generation collection should cause"""
+        self.mbyte_limit = mbyte_limit
+        """do a full collection if less memory is available"""
+        self.mbyte_growth_limit = mbyte_growth_limit
+        """do a full collection if the process has grown by this amount since the last full collection"""
+        self.memory_check_interval = memory_check_interval
+        self.max_delay = max_delay
+        """collect even if the loop is busy if a pending collection has been deferred for this many seconds"""
+
+        self.stats = [CollectionStats() for _ in range(3)]
+        self.skipped_busy = 0
+        self._last_memory_check = 0.0
+        self._memory_is_low = False
+        self._rss_after_full_collection = 0
+        self._threshold0 = gc.get_threshold()[0]
+        self._pending_reason: Optional[str] = None
+        self._deferred_since: Optional[float] = None
+
+    async def step(self) -> None:
+        reason = self._full_collection_reason() or self._pending_reason
+        lag = await self._measure_lag()
+        now = time.perf_counter()
+        overdue = self._deferred_since is not None and now - self._deferred_since > self.max_delay
+        count0, count1, _ = gc.get_count()
+        if lag > self.idle_lag and not (reason and self._memory_is_low) and not overdue:
+            if reason or count0 >= self._threshold0:
+                self._pending_reason = reason  # NOTE: the reason is only determined once per memory check interval
+                if self._deferred_since is None:
+                    self._deferred_since = now
+            self.skipped_busy += 1
+            return
+        self._pending_reason = None
+        self._deferred_since = None
+        if reason:
+            log.warning('%s -> start garbage collection', reason)
+            self._collect(2)
+            self._rss_after_full_collection = psutil.Process().memory_info().rss
+            log.warning('finished garbage collection')
+            return
+
+        if count0 < self._threshold0:
+            return
+        generation = 1 if count1 >= gc.get_threshold()[1] else 0
+        pause = self._collect(generation)
+        if generation == 0:
+            self._adapt_threshold(pause)
+
+    @staticmethod
+    async def _measure_lag() -> float:
+        start = time.perf_counter()
+        await asyncio.sleep(0)
+        return time.perf_counter() - start
+
+    def _full_collection_reason(self) -> Optional[str]:
+        """Check the memory (at most once per `memory_check_interval`) and return why a full collection is needed."""
+        now = time.perf_counter()
+        if now - self._last_memory_check < self.memory_check_interval:
+            return None
+        self._last_memory_check = now
+        self._memory_is_low = psutil.virtual_memory().available < self.mbyte_limit * 1_000_000
+        if self._memory_is_low:
+            return f'less than {self.mbyte_limit} mb of memory remaining'  # NOTE: collect even if the loop is busy
+        rss = psutil.Process().memory_info().rss
+        if not self._rss_after_full_collection:
+            self._rss_after_full_collection = rss
+        if rss - self._rss_after_full_collection > self.mbyte_growth_limit * 1_000_000:
+            return f'process grew by more than {self.mbyte_growth_limit} mb since the last full collection'
+        return None
+
+    def _collect(self, generation: int) -> float:
+        start = time.perf_counter()
+        gc.collect(generation)
+        pause = time.perf_counter() - start
+        self.stats[generation].add(pause)
+        return pause
+
+    def _adapt_threshold(self, pause: float) -> None:
+        """Collect more often if a slice exceeds the pause budget and less often if it is well below."""
+        default = gc.get_threshold()[0]
+        if pause > self.pause_budget:
+            self._threshold0 = max(self._threshold0 // 2, default // 4)
+        elif pause < self.pause_budget / 4:
+            self._threshold0 = min(self._threshold0 * 2, default * 16)
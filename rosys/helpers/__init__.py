@@ -11,10 +11,12 @@ from typing import Any, Awaitable, Callable, Generator, Optional
 import numpy as np
 from nicegui import app
 
-from .lazy_worker import LazyWorker
+from .lazy_worker import LazyWorker, LazyWorkerPool, LazyWorkerStats
 
 __all__ = [
     'LazyWorker',
+    'LazyWorkerPool',
+    'LazyWorkerStats',
     'invoke',
     'measure',
     'angle',
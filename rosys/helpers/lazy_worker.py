@@ -1,5 +1,6 @@
 import asyncio
-from typing import Any, Coroutine, TypeVar
+from dataclasses import dataclass
+from typing import Any, Coroutine, Hashable, Optional, TypeVar
 
 _T = TypeVar('_T')
 
@@ -29,3 +30,79 @@ class LazyWorker:
     def _notify(self) -> None:
         self._condition.set()
         self._condition.clear()
+
+
+@dataclass(slots=True, kw_only=True)
+class LazyWorkerStats:
+    completed: int = 0
+    failed: int = 0  # NOTE: raised an exception or was cancelled while running
+    replaced: int = 0  # NOTE: superseded by a newer request with the same key before it could start
+    dropped: int = 0  # NOTE: evicted because too many keys were waiting or cancelled while waiting
+
+
+class LazyWorkerPool:
+    """A pool of workers which runs at most `workers` coroutines at the same time.
+
+    For each key there is at most one running and one waiting coroutine.
+    A new coroutine replaces the waiting coroutine with the same key (latest wins), which is then closed and returns `None`.
+    Waiting keys are served in the order in which they have been (re-)submitted.
+    """
+
+    def __init__(self, workers: int = 1, *, max_pending: Optional[int] = None) -> None:
+        self.workers = workers
+        self.max_pending = max_pending
+        self.stats = LazyWorkerStats()
+        self._running: set[Hashable] = set()
+        self._pending: dict[Hashable, asyncio.Future[bool]] = {}
+
+    async def run(self, coro: Coroutine[Any, None, _T], key: Hashable = None) -> _T | None:
+        if key in self._pending:
+            self._pending.pop(key).set_result(False)
+            self.stats.replaced += 1
+        future: asyncio.Future[bool] = asyncio.get_running_loop().create_future()
+        self._pending[key] = future
+        if self.max_pending is not None and len(self._pending) > self.max_pending:
+            self._pending.pop(next(iter(self._pending))).set_result(False)
+            self.stats.dropped += 1
+        self._dispatch()
+
+        try:
+            may_start = await future
+        except asyncio.CancelledError:
+            coro.close()
+            if future.cancelled():
+                if self._pending.get(key) is future:
+                    del self._pending[key]
+                self.stats.dropped += 1
+            elif future.result():
+                self._release(key)  # NOTE: the slot has already been reserved for this coroutine
+            raise
+        if not may_start:
+            coro.close()
+            return None
+
+        try:
+            result = await coro
+        except BaseException:
+            self.stats.failed += 1
+            raise
+        finally:
+            self._release(key)
+        self.stats.completed += 1
+        return result
+
+    def _release(self, key: Hashable) -> None:
+        self._running.discard(key)
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        for key, future in list(self._pending.items()):
+            if len(self._running) >= self.workers:
+                break
+            if key in self._running:
+                continue
+            del self._pending[key]
+            if future.done():
+                continue  # NOTE: the waiting coroutine has been cancelled
+            self._running.add(key)
+            future.set_result(True)
@@ -4,17 +4,26 @@ from matplotlib.path import Path
 
 class BinaryRenderer:
 
-    def __init__(self, size, fill_value: bool = False) -> None:
+    def __init__(self, size, fill_value: bool = False, *, offset: tuple[int, int] = (0, 0)) -> None:
+        """Render into a map of the given size.
+
+        The optional `offset` (row, column) places the map as a window into a larger map.
+        All coordinates are given in the coordinate frame of the larger map.
+        """
         self.map = np.full(size, fill_value=fill_value, dtype=bool)
+        self.offset = offset
 
-        self.xx, self.yy = np.meshgrid(range(size[1]), range(size[0]))
+        self.xx, self.yy = np.meshgrid(range(offset[1], offset[1] + size[1]), range(offset[0], offset[0] + size[0]))
         self.xy = np.vstack((self.xx.flatten(), self.yy.flatten())).T
 
     def circle(self, x, y, radius, value=True) -> None:
-        x0 = max(int(x - radius), 0)
-        y0 = max(int(y - radius), 0)
-        x1 = min(int(x + radius) + 2, self.map.shape[1] - 1)
-        y1 = min(int(y + radius) + 2, self.map.shape[0] - 1)
+        row, col = self.offset
+        x0 = max(int(x - radius), col) - col
+        y0 = max(int(y - radius), row) - row
+        x1 = min(int(x + radius) + 2, col + self.map.shape[1] - 1) - col
+        y1 = min(int(y + radius) + 2, row + self.map.shape[0] - 1) - row
+        if x1 <= x0 or y1 <= y0:
+            return  # NOTE: the circle is outside of the map
         roi = self.map[y0:y1, x0:x1]
         sqr_dist = (self.xx[y0:y1, x0:x1] - x)**2 + (self.yy[y0:y1, x0:x1] - y)**2
         roi[sqr_dist <= radius**2] = value
@@ -23,10 +32,13 @@ class BinaryRenderer:
     def polygon(self, points, value=True) -> None:
         if len(points) == 0:
             return
-        x0 = max(int(points[:, 0].min()), 0)
-        y0 = max(int(points[:, 1].min()), 0)
-        x1 = min(int(points[:, 0].max()) + 2, self.map.shape[1] - 1)
-        y1 = min(int(points[:, 1].max()) + 2, self.map.shape[0] - 1)
+        row, col = self.offset
+        x0 = max(int(points[:, 0].min()), col) - col
+        y0 = max(int(points[:, 1].min()), row) - row
+        x1 = min(int(points[:, 0].max()) + 2, col + self.map.shape[1] - 1) - col
+        y1 = min(int(points[:, 1].max()) + 2, row + self.map.shape[0] - 1) - row
+        if x1 <= x0 or y1 <= y0:
+            return  # NOTE: the polygon is outside of the map
         xy = np.vstack((self.xx[y0:y1, x0:x1].flatten(), self.yy[y0:y1, x0:x1].flatten())).T
         roi = self.map[y0:y1, x0:x1]
         roi[Path(points).contains_points(xy).reshape(roi.shape)] = value
@@ -1,7 +1,9 @@
 import itertools
 import logging
+import threading
 from dataclasses import dataclass
 from functools import lru_cache
+from pathlib import Path
 from typing import Optional
 
 import networkx as nx
@@ -16,7 +18,8 @@ from .delaunay_pose_group import DelaunayPoseGroup
 from .fast_spline import FastSpline
 from .grid import Grid
 from .obstacle import Obstacle
-from .obstacle_map import ObstacleMap
+from .obstacle_map import ObstacleMap, has_areas
+from .planner_cache import CacheEntry, PlannerCache
 
 GRID_RESOLUTION = 1.0
 MIN_MARGIN = 1.0
@@ -33,8 +36,11 @@ TRY_SINGLE_SHUNTING = True
 
 class DelaunayPlanner:
 
-    def __init__(self, robot_outline: list[tuple[float, float]]) -> None:
+    def __init__(self, robot_outline: list[tuple[float, float]], *,
+                 compact_map: bool = False, cache_path: Optional[Path] = None) -> None:
         self.robot_outline = robot_outline
+        self.compact_map = compact_map
+        self.cache = PlannerCache(cache_path) if cache_path else None
         self.areas: list[Area] = []
         self.obstacles: list[Obstacle] = []
         self.obstacle_map: Optional[ObstacleMap] = None
@@ -42,19 +48,60 @@ class DelaunayPlanner:
         self.tri_mesh: Optional[spatial.Delaunay] = None
         self.pose_groups: Optional[list[DelaunayPoseGroup]] = None
         self.graph: Optional[nx.DiGraph] = None
+        self.world_version: Optional[int] = None
         self.log = logging.getLogger('rosys.delaunay_planner')
+        self._cache_thread: Optional[threading.Thread] = None
 
     def update_map(self, areas: list[Area], obstacles: list[Obstacle], additional_points: list[Point],
-                   deadline: float) -> None:
+                   deadline: float, *, world_version: Optional[int] = None) -> None:
+        """Update obstacle map and graph if areas or obstacles changed or additional points are outside of the map.
+
+        If a `world_version` is given and matches the one of the last update, areas and obstacles are not compared.
+        """
         if self.obstacle_map and \
-                self.areas == areas and \
-                self.obstacles == obstacles and \
+                (world_version is not None and world_version == self.world_version or
+                 self.areas == areas and self.obstacles == obstacles) and \
                 all(self.obstacle_map.grid.contains(point, padding=1.0) for point in additional_points):
+            self.world_version = world_version
+            return
+        self.world_version = None
+        if self.obstacle_map and self._update_obstacle_map(areas, obstacles, additional_points, deadline):
+            self.world_version = world_version
             return
         self.areas = areas
         self.obstacles = obstacles
-        self._create_obstacle_map(additional_points, deadline)
-        self._create_graph()
+        try:
+            self._create_map_and_graph(additional_points, deadline)
+        except Exception:
+            self.obstacle_map = None  # NOTE: the map does not match the areas and obstacles anymore
+            raise
+        self.world_version = world_version
+
+    def _update_obstacle_map(self, areas: list[Area], obstacles: list[Obstacle], additional_points: list[Point],
+                             deadline: float) -> bool:
+        """Update the existing obstacle map and graph only where areas or obstacles changed.
+
+        Returns False if the changes do not fit into the existing map and it needs to be recreated.
+        """
+        assert self.obstacle_map is not None
+        changed_points = _changed_points(self.areas, areas) + _changed_points(self.obstacles, obstacles)
+        if not changed_points or has_areas(self.areas) != has_areas(areas) or \
+                not all(self.obstacle_map.grid.contains(point, padding=1.0) for point in changed_points + additional_points):
+            return False
+        if self._load_from_cache(areas, obstacles, self.obstacle_map.grid):
+            self.areas = areas
+            self.obstacles = obstacles
+            return True
+        self.wait_for_cache()  # NOTE: the map and graph must not be modified while they are being saved
+        try:
+            rows, cols = self.obstacle_map.update_world(areas, obstacles, changed_points, deadline)
+            self._patch_graph(rows, cols)
+        except Exception:
+            self.obstacle_map = None  # NOTE: the map might be partially updated
+            raise
+        self.areas = areas
+        self.obstacles = obstacles
+        return True
 
     def grow_map(self, points: list[Point], deadline: float) -> None:
         if self.obstacle_map is not None and \
@@ -66,17 +113,64 @@ class DelaunayPlanner:
             points.append(Point(x=bbox[0]+bbox[2], y=bbox[1]))
             points.append(Point(x=bbox[0],         y=bbox[1]+bbox[3]))
             points.append(Point(x=bbox[0]+bbox[2], y=bbox[1]+bbox[3]))
-        self._create_obstacle_map(points, deadline)
-        self._create_graph()
+        self._create_map_and_graph(points, deadline)
 
-    def _create_obstacle_map(self, additional_points: list[Point], deadline: float) -> None:
+    def _create_map_and_graph(self, additional_points: list[Point], deadline: float) -> None:
         points = [p for obstacle in self.obstacles for p in obstacle.outline]
         points += [p for area in self.areas for p in area.outline]
         points += additional_points
         grid = Grid.from_points(points, pixel_size=0.1, num_layers=36, padding=1.0)
-        self.obstacle_map = ObstacleMap.from_world(self.robot_outline, self.areas, self.obstacles, grid, deadline)
+        if self._load_from_cache(self.areas, self.obstacles, grid):
+            return
+        self.obstacle_map = ObstacleMap.from_world(self.robot_outline, self.areas, self.obstacles, grid, deadline,
+                                                   compact=self.compact_map)
+        self._create_graph()
+        if self.cache:
+            assert self.tri_points is not None
+            assert self.pose_groups is not None
+            assert self.graph is not None
+            key = self.cache.key(self.robot_outline, self.areas, self.obstacles, grid, self.compact_map)
+            entry = CacheEntry(obstacle_map=self.obstacle_map, tri_points=self.tri_points,
+                               pose_groups=self.pose_groups, graph=self.graph)
+            # NOTE: writing large maps takes seconds, so it must not delay the query which is waiting for the map
+            self.wait_for_cache()
+            self._cache_thread = threading.Thread(target=self.cache.save, args=(key, entry), name='planner cache')
+            self._cache_thread.start()
+
+    def wait_for_cache(self) -> None:
+        """Wait until the last obstacle map and graph have been written to the cache."""
+        if self._cache_thread is not None:
+            self._cache_thread.join()
+            self._cache_thread = None
+
+    def _load_from_cache(self, areas: list[Area], obstacles: list[Obstacle], grid: Grid) -> bool:
+        if not self.cache:
+            return False
+        entry = self.cache.load(self.cache.key(self.robot_outline, areas, obstacles, grid, self.compact_map),
+                                self.robot_outline)
+        if entry is None:
+            return False
+        self.log.info('loaded obstacle map and graph from cache')
+        self.obstacle_map = entry.obstacle_map
+        self.tri_points = entry.tri_points
+        self.tri_mesh = None  # NOTE: the mesh is only needed to create the pose groups
+        self.pose_groups = entry.pose_groups
+        self.graph = entry.graph
+        return True
 
     def _create_graph(self) -> None:
+        self._create_pose_groups()
+        assert self.pose_groups is not None
+        self.graph = nx.DiGraph()
+        for g, group in enumerate(self.pose_groups):
+            for p in range(len(group.poses)):
+                self.graph.add_node((g, p))
+        for g, group in enumerate(self.pose_groups):
+            for p in range(len(group.poses)):
+                self._connect(g, p)
+
+    def _create_pose_groups(self) -> None:
+        """Sample triangulation points on the obstacle map and create a pose group for each of them."""
         assert self.obstacle_map is not None
         min_x, min_y, size_x, size_y = self.obstacle_map.grid.bbox
         X, Y = np.meshgrid(np.arange(min_x, min_x + size_x - GRID_RESOLUTION / 2, GRID_RESOLUTION),
@@ -95,8 +189,7 @@ class DelaunayPlanner:
         X[close] += dD_dX[close] / dD[close] * (MIN_MARGIN - D[close])
         Y[close] += dD_dY[close] / dD[close] * (MIN_MARGIN - D[close])
 
-        keep = np.reshape([not all(self.obstacle_map.stack[int(np.round(row)), int(np.round(col)), :])
-                           for row, col in zip(rows, cols)], X.shape)
+        keep = ~self.obstacle_map.is_blocked(np.round(rows).astype(int), np.round(cols).astype(int)).reshape(X.shape)
         keep[1::2, :] = np.logical_and(keep[1::2, :], D[1::2, :] < 2)
         keep[::4, 1::2] = np.logical_and(keep[::4, 1::2], D[::4, 1::2] < 2)
         keep[2::4, ::2] = np.logical_and(keep[2::4, ::2], D[2::4, ::2] < 2)
@@ -117,21 +210,82 @@ class DelaunayPlanner:
             for i, point in enumerate(self.tri_points)
         ]
 
+    def _connect(self, g: int, p: int) -> None:
+        """Add all collision-free edges from pose `p` of group `g` to the poses of the neighbor group it points to."""
+        assert self.obstacle_map is not None
+        assert self.pose_groups is not None
+        assert self.graph is not None
+        pose = self.pose_groups[g].poses[p]
+        g_ = self.pose_groups[g].neighbor_indices[p]
+        for p_, pose_ in enumerate(self.pose_groups[g_].poses):
+            if abs(angle(pose.yaw, pose_.yaw + np.pi)) < 0.01:
+                continue  # NOTE: avoid 180-degree turns
+            x, y, yaw = _generate_poses(self.obstacle_map.grid, pose, pose_)
+            if not self.obstacle_map.test(x, y, yaw).any():
+                length = np.sum(np.sqrt(np.diff(x)**2 + np.diff(y)**2))
+                self.graph.add_edge((g, p), (g_, p_), backward=False, weight=length)
+                if ((g_, p_), (g, p)) not in self.graph.edges:
+                    self.graph.add_edge((g_, p_), (g, p), backward=True, weight=1.2*length)
+
+    def _patch_graph(self, rows: slice, cols: slice) -> None:
+        """Create the graph for the updated obstacle map, but only test edges which might pass through the given region.
+
+        Triangulation points are sampled again, so removed obstacles free new points and new obstacles remove points.
+        Edges between groups whose points and neighbors did not change are copied from the old graph.
+        The result is the same as with `_create_graph`.
+        """
+        assert self.obstacle_map is not None
+        assert self.tri_points is not None
+        assert self.pose_groups is not None
+        assert self.graph is not None
+        old_points, old_groups, old_graph = self.tri_points, self.pose_groups, self.graph
+        self._create_pose_groups()
+        assert self.tri_points is not None
+        assert self.pose_groups is not None
+        old_indices = {(x, y): g for g, (x, y) in enumerate(old_points.tolist())}
+        indices = [old_indices.get((x, y)) for x, y in self.tri_points.tolist()]
+        # NOTE: the order of the neighbors might change, so poses are mapped via the neighbors they point to
+        pose_indices: list[Optional[dict[int, int]]] = []
+        for group, index in zip(self.pose_groups, indices):
+            neighbors = [indices[g_] for g_ in group.neighbor_indices]
+            if index is None or set(neighbors) != set(old_groups[index].neighbor_indices):
+                pose_indices.append(None)
+                continue
+            pose_indices.append({p: neighbors.index(n) for p, n in enumerate(old_groups[index].neighbor_indices)})
+
+        min_x, min_y = self.obstacle_map.grid.from_grid(rows.start - 1, cols.start - 1)
+        max_x, max_y = self.obstacle_map.grid.from_grid(rows.stop, cols.stop)
         self.graph = nx.DiGraph()
         for g, group in enumerate(self.pose_groups):
             for p in range(len(group.poses)):
                 self.graph.add_node((g, p))
         for g, group in enumerate(self.pose_groups):
-            for p, (pose, g_) in enumerate(zip(group.poses, group.neighbor_indices)):
-                for p_, pose_ in enumerate(self.pose_groups[g_].poses):
-                    if abs(angle(pose.yaw, pose_.yaw + np.pi)) < 0.01:
-                        continue  # NOTE: avoid 180-degree turns
-                    x, y, yaw = _generate_poses(self.obstacle_map.grid, pose, pose_)
-                    if not self.obstacle_map.test(x, y, yaw).any():
-                        length = np.sum(np.sqrt(np.diff(x)**2 + np.diff(y)**2))
-                        self.graph.add_edge((g, p), (g_, p_), backward=False, weight=length)
-                        if ((g_, p_), (g, p)) not in self.graph.edges:
-                            self.graph.add_edge((g_, p_), (g, p), backward=True, weight=1.2*length)
+            for g_ in group.neighbor_indices:
+                if g_ < g:
+                    continue
+                # NOTE: the spline stays within the convex hull of its control points half the distance away
+                point_ = self.pose_groups[g_].point
+                margin = group.point.distance(point_) / 2
+                if pose_indices[g] is not None and pose_indices[g_] is not None and \
+                        not (min(group.point.x, point_.x) - margin <= max_x and max(group.point.x, point_.x) + margin >= min_x and
+                             min(group.point.y, point_.y) - margin <= max_y and max(group.point.y, point_.y) + margin >= min_y):
+                    self._copy_edges(old_graph, indices, pose_indices, g, g_)
+                else:
+                    for a, b in [(g, g_), (g_, g)]:
+                        self._connect(a, self.pose_groups[a].neighbor_indices.index(b))
+
+    def _copy_edges(self, old_graph: nx.DiGraph, indices: list[Optional[int]],
+                    pose_indices: list[Optional[dict[int, int]]], g: int, g_: int) -> None:
+        """Copy all edges between groups `g` and `g_` from the old graph, mapping old to new group and pose indices."""
+        assert self.graph is not None
+        for a, b in [(g, g_), (g_, g)]:
+            old_a, old_b = indices[a], indices[b]
+            poses_a, poses_b = pose_indices[a], pose_indices[b]
+            assert poses_a is not None and poses_b is not None
+            for old_p, p in poses_a.items():
+                for _, (old_target, old_p_), data in old_graph.out_edges((old_a, old_p), data=True):
+                    if old_target == old_b:
+                        self.graph.add_edge((a, p), (b, poses_b[old_p_]), **data)
 
     def search(self, start: Pose, goal: Pose) -> list[PathSegment]:
         assert self.obstacle_map is not None
@@ -236,6 +390,16 @@ class DelaunayPlanner:
         return min(paths, key=len)
 
 
+def _changed_points(old: list[Area] | list[Obstacle], new: list[Area] | list[Obstacle]) -> list[Point]:
+    """Outline points of all items which were added, removed or changed."""
+    old_items = {item.id: item for item in old}
+    new_items = {item.id: item for item in new}
+    return [point
+            for id_ in old_items.keys() | new_items.keys() if old_items.get(id_) != new_items.get(id_)
+            for item in (old_items.get(id_), new_items.get(id_)) if item is not None
+            for point in item.outline]
+
+
 def _tri_neighbors(tri_mesh: spatial.Delaunay, vertex_index: int) -> np.ndarray:
     return tri_mesh.vertex_neighbor_vertices[1][tri_mesh.vertex_neighbor_vertices[0][vertex_index]:
                                                 tri_mesh.vertex_neighbor_vertices[0][vertex_index + 1]]
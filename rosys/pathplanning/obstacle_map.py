@@ -1,38 +1,65 @@
 from __future__ import annotations
 
 import time
-from typing import Optional, overload
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional, overload
 
 import cv2
 import numpy as np
 from scipy import ndimage
 
+from ..geometry import Point
 from .area import Area
 from .binary_renderer import BinaryRenderer
 from .grid import Grid
 from .obstacle import Obstacle
 from .robot_renderer import RobotRenderer
 
+NUM_THREADS: Optional[int] = None
+"""Number of threads computing the yaw layers in parallel (default: see `ThreadPoolExecutor`)."""
+
+DISTANCE_UNIT = 0.01
+"""Resolution in meters of the distances in compact obstacle maps (larger distances than 655.35 m are clipped)."""
+
 
 class ObstacleMap:
+    """Collision and distance layers of a map for a number of robot yaw angles.
+
+    In compact mode the collision layers are bit-packed and the distances are stored as multiples of `DISTANCE_UNIT`
+    in 16-bit integers, which needs about 2.1 instead of 9 bytes per cell and layer.
+    """
 
-    def __init__(self, grid, map_, robot_renderer, deadline=None) -> None:
+    def __init__(self, grid, map_, robot_renderer, deadline=None, *,
+                 compact: bool = False, layers: Optional[dict[str, np.ndarray]] = None) -> None:
+        """Create the layers for the given map or use precomputed `layers` (attribute name -> array)."""
         self.grid = grid
         self.map = map_
-        self.stack = np.zeros(grid.size, dtype=bool)
-        self.dist_stack = np.zeros(self.stack.shape)
-        for layer in range(grid.size[2]):
-            _, _, yaw = grid.from_3d_grid(0, 0, layer)
-            kernel = robot_renderer.render(grid.pixel_size, yaw).astype(np.uint8)
-            self.stack[:, :, layer] = cv2.dilate(self.map.astype(np.uint8), kernel)
-            self.dist_stack[:, :, layer] = \
-                ndimage.distance_transform_edt(~self.stack[:, :, layer]) * grid.pixel_size
-            if deadline and time.time() > deadline:
-                raise TimeoutError('obstacle map creation took too long')
-
-        # NOTE: when yaw wraps around, map_coordinates should wrap around on axis 2
-        self.stack = np.dstack((self.stack, self.stack[:, :, :1]))
-        self.dist_stack = np.dstack((self.dist_stack, self.dist_stack[:, :, :1]))
+        self.compact = compact
+        self.kernels = [robot_renderer.render(grid.pixel_size, grid.from_3d_grid(0, 0, layer)[2]).astype(np.uint8)
+                        for layer in range(grid.size[2])]
+        height, width, num_layers = grid.size
+        self.stack: Optional[np.ndarray] = None
+        self.dist_stack: Optional[np.ndarray] = None
+        self.packed_stack: Optional[np.ndarray] = None
+        self.quantized_dist_stack: Optional[np.ndarray] = None
+        if layers is not None:
+            for name, array in layers.items():
+                setattr(self, name, array)
+            return
+        if compact:
+            self.packed_stack = np.zeros((num_layers, height, (width + 7) // 8), dtype=np.uint8)
+            self.quantized_dist_stack = np.zeros((num_layers, height, width), dtype=np.uint16)
+        else:
+            self.stack = np.zeros(grid.size, dtype=bool)
+            self.dist_stack = np.zeros(grid.size)
+        binary_map = self.map.astype(np.uint8)
+        everything = slice(None)
+
+        def create_layer(layer: int) -> None:
+            stack = cv2.dilate(binary_map, self.kernels[layer]).astype(bool)
+            self._set_layer(layer, everything, everything, stack)
+            self._set_distances(layer, everything, everything, ndimage.distance_transform_edt(~stack) * grid.pixel_size)
+        _run_layers(create_layer, num_layers, deadline, 'obstacle map creation took too long')
 
     @staticmethod
     def from_list(grid, obstacles, robot_renderer) -> ObstacleMap:
@@ -49,23 +76,162 @@ class ObstacleMap:
                    areas: list[Area],
                    obstacles: list[Obstacle],
                    grid: Grid,
-                   deadline: Optional[float] = None) -> ObstacleMap:
+                   deadline: Optional[float] = None,
+                   *,
+                   compact: bool = False) -> ObstacleMap:
         robot_renderer = RobotRenderer(robot_outline)
-        has_areas = any(len(a.outline) > 2 for a in areas)
-        binary_renderer = BinaryRenderer(grid.size[:2], fill_value=has_areas)
-        for area in areas:
-            binary_renderer.polygon(np.array([grid.to_grid(p.x, p.y)[::-1] for p in area.outline]), False)
-            if deadline and time.time() > deadline:
-                raise TimeoutError('obstacle map creation took too long')
-        for obstacle in obstacles:
-            binary_renderer.polygon(np.array([grid.to_grid(p.x, p.y)[::-1] for p in obstacle.outline]))
-            if deadline and time.time() > deadline:
-                raise TimeoutError('obstacle map creation took too long')
-        return ObstacleMap(grid, binary_renderer.map, robot_renderer, deadline)
-
-    def test(self, x, y, yaw):
+        binary_renderer = BinaryRenderer(grid.size[:2], fill_value=has_areas(areas))
+        _render_world(binary_renderer, grid, areas, obstacles, deadline)
+        return ObstacleMap(grid, binary_renderer.map, robot_renderer, deadline, compact=compact)
+
+    def update_world(self,
+                     areas: list[Area],
+                     obstacles: list[Obstacle],
+                     changed_points: list[Point],
+                     deadline: Optional[float] = None) -> tuple[slice, slice]:
+        """Re-render the map around the given points of changed areas and obstacles and update the affected layers.
+
+        The areas must still be present or absent as a whole (see `has_areas`), otherwise the map needs to be recreated.
+        Returns the rows and columns of the region in which the collision layers might have changed.
+        """
+        rows, cols = self.grid.to_grid(np.array([p.x for p in changed_points]), np.array([p.y for p in changed_points]))
+        height, width = self.map.shape
+        dirty_rows = slice(max(int(np.floor(rows.min())), 0), min(int(rows.max()) + 2, height))
+        dirty_cols = slice(max(int(np.floor(cols.min())), 0), min(int(cols.max()) + 2, width))
+        # NOTE: the renderer does not draw its last row and column, so we render one more and only keep the dirty part
+        render_rows = slice(dirty_rows.start, min(dirty_rows.stop + 1, height))
+        render_cols = slice(dirty_cols.start, min(dirty_cols.stop + 1, width))
+        binary_renderer = BinaryRenderer((render_rows.stop - render_rows.start, render_cols.stop - render_cols.start),
+                                         fill_value=has_areas(areas),
+                                         offset=(render_rows.start, render_cols.start))
+        _render_world(binary_renderer, self.grid, areas, obstacles, deadline)
+        self.map[dirty_rows, dirty_cols] = \
+            binary_renderer.map[:dirty_rows.stop - dirty_rows.start, :dirty_cols.stop - dirty_cols.start]
+        return self.update(dirty_rows, dirty_cols, deadline)
+
+    def update(self, rows: slice, cols: slice, deadline: Optional[float] = None) -> tuple[slice, slice]:
+        """Recompute all layers after the map has been changed within the given rows and columns.
+
+        Only the region which can be affected by the change is dilated again.
+        The distance transform is repeated in a window which contains every cell whose distance might have changed.
+        Returns the rows and columns of the region in which the collision layers might have changed.
+        """
+        height, width = self.map.shape
+        radius = max(kernel.shape[0] for kernel in self.kernels) // 2
+        dirty_rows = slice(max(rows.start - radius, 0), min(rows.stop + radius, height))
+        dirty_cols = slice(max(cols.start - radius, 0), min(cols.stop + radius, width))
+        if self.compact:  # NOTE: packed layers can only be written in whole bytes
+            dirty_cols = slice(dirty_cols.start // 8 * 8, min((dirty_cols.stop + 7) // 8 * 8, width))
+        input_rows = slice(max(dirty_rows.start - radius, 0), min(dirty_rows.stop + radius, height))
+        input_cols = slice(max(dirty_cols.start - radius, 0), min(dirty_cols.stop + radius, width))
+        inner = (slice(dirty_rows.start - input_rows.start, dirty_rows.stop - input_rows.start),
+                 slice(dirty_cols.start - input_cols.start, dirty_cols.stop - input_cols.start))
+        map_ = self.map[input_rows, input_cols].astype(np.uint8)
+
+        def update_layer(layer: int) -> None:
+            self._set_layer(layer, dirty_rows, dirty_cols, cv2.dilate(map_, self.kernels[layer])[inner].astype(bool))
+            self._update_distances(layer, dirty_rows, dirty_cols)
+        _run_layers(update_layer, len(self.kernels), deadline, 'obstacle map update took too long')
+        return dirty_rows, dirty_cols
+
+    def _update_distances(self, layer: int, dirty_rows: slice, dirty_cols: slice) -> None:
+        height, width = self.map.shape
+        everything = slice(None)
+        distances = self.get_layer_distances(layer) / self.grid.pixel_size
+        free = ~self.get_layer(layer)
+        if distances.min() > 0:
+            # NOTE: without any obstacle in the old layer there are no meaningful distances to start from
+            self._set_distances(layer, everything, everything, ndimage.distance_transform_edt(free) * self.grid.pixel_size)
+            return
+
+        # NOTE: a cell can only change if it is not closer to an unchanged obstacle than to the dirty region
+        tolerance = (DISTANCE_UNIT / 2 / self.grid.pixel_size if self.compact else 0) + 1e-6
+        row_gaps = _gaps(np.arange(height), dirty_rows)
+        col_gaps = _gaps(np.arange(width), dirty_cols)
+        affected_rows = np.flatnonzero(distances.max(axis=1) + tolerance >= row_gaps)
+        affected_cols = np.flatnonzero(distances.max(axis=0) + tolerance >= col_gaps)
+        rows = slice(affected_rows.min(), affected_rows.max() + 1)
+        cols = slice(affected_cols.min(), affected_cols.max() + 1)
+
+        # NOTE: obstacles up to the largest old distance away are needed to reproduce the new distances
+        margin = int(np.ceil(distances[rows, cols].max())) + 1
+        window_rows = slice(max(rows.start - margin, 0), min(rows.stop + margin, height))
+        window_cols = slice(max(cols.start - margin, 0), min(cols.stop + margin, width))
+        window = free[window_rows, window_cols]
+        if window.shape == free.shape or window.all():
+            self._set_distances(layer, everything, everything, ndimage.distance_transform_edt(free) * self.grid.pixel_size)
+            return
+        window_distances = ndimage.distance_transform_edt(window)[rows.start - window_rows.start:rows.stop - window_rows.start,
+                                                                   cols.start - window_cols.start:cols.stop - window_cols.start]
+
+        # NOTE: if an obstacle was removed, the nearest remaining obstacle of a cell might be outside of the window
+        border_rows = _border_gaps(np.arange(rows.start, rows.stop), window_rows, height)
+        border_cols = _border_gaps(np.arange(cols.start, cols.stop), window_cols, width)
+        if (window_distances > np.minimum.outer(border_rows, border_cols)).any():
+            self._set_distances(layer, everything, everything, ndimage.distance_transform_edt(free) * self.grid.pixel_size)
+            return
+        self._set_distances(layer, rows, cols, window_distances * self.grid.pixel_size)
+
+    def get_layer(self, layer: int) -> np.ndarray:
+        """Collision layer of the given yaw layer index as boolean array."""
+        if self.compact:
+            assert self.packed_stack is not None
+            return np.unpackbits(self.packed_stack[layer], axis=1, count=self.map.shape[1]).view(bool)
+        assert self.stack is not None
+        return self.stack[:, :, layer]
+
+    def _set_layer(self, layer: int, rows: slice, cols: slice, values: np.ndarray) -> None:
+        if self.compact:
+            assert self.packed_stack is not None
+            start = 0 if cols.start is None else cols.start // 8
+            self.packed_stack[layer, rows, start:start + (values.shape[1] + 7) // 8] = np.packbits(values, axis=1)
+        else:
+            assert self.stack is not None
+            self.stack[rows, cols, layer] = values
+
+    def get_layer_distances(self, layer: int) -> np.ndarray:
+        """Obstacle distances in meters for the given yaw layer index."""
+        if self.compact:
+            assert self.quantized_dist_stack is not None
+            return self.quantized_dist_stack[layer] * DISTANCE_UNIT
+        assert self.dist_stack is not None
+        return self.dist_stack[:, :, layer]
+
+    def _set_distances(self, layer: int, rows: slice, cols: slice, values: np.ndarray) -> None:
+        if self.compact:
+            assert self.quantized_dist_stack is not None
+            self.quantized_dist_stack[layer, rows, cols] = np.minimum(np.round(values / DISTANCE_UNIT), 2**16 - 1)
+        else:
+            assert self.dist_stack is not None
+            self.dist_stack[rows, cols, layer] = values
+
+    def _to_indices(self, x, y, yaw) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """Nearest cell indices like `ndimage.map_coordinates` with `order=0` (cells outside of the map are invalid)."""
         row, col, layer = self.grid.to_3d_grid(x, y, yaw)
-        return ndimage.map_coordinates(self.stack, [[row], [col], [layer]], order=0)
+        rows, cols, layers = np.array([row], dtype=float), np.array([col], dtype=float), np.array([layer], dtype=float)
+        height, width = self.map.shape
+        valid = (0 <= rows) & (rows <= height - 1) & (0 <= cols) & (cols <= width - 1)
+        rows = np.floor(np.where(valid, rows, 0) + 0.5).astype(int)
+        cols = np.floor(np.where(valid, cols, 0) + 0.5).astype(int)
+        layers = np.floor(layers + 0.5).astype(int) % self.grid.size[2]  # NOTE: the yaw wraps around
+        return valid, rows, cols, layers
+
+    def test(self, x, y, yaw) -> np.ndarray:
+        valid, rows, cols, layers = self._to_indices(x, y, yaw)
+        if self.compact:
+            assert self.packed_stack is not None
+            bits = self.packed_stack[layers, rows, cols // 8] >> (7 - cols % 8) & 1
+            return valid & bits.astype(bool)
+        assert self.stack is not None
+        return valid & self.stack[rows, cols, layers]
+
+    def is_blocked(self, rows: np.ndarray, cols: np.ndarray) -> np.ndarray:
+        """Whether the given cells are blocked for all yaw angles."""
+        if self.compact:
+            assert self.packed_stack is not None
+            return (self.packed_stack[:, rows, cols // 8] >> (7 - cols % 8) & 1).all(axis=0)
+        assert self.stack is not None
+        return self.stack[rows, cols, :].all(axis=-1)
 
     t_lookup = [np.linspace(0, 1, i) for i in range(360)]
 
@@ -93,11 +259,67 @@ class ObstacleMap:
         return pose(t)
 
     def test_spline(self, spline, backward=False) -> bool:
-        return self.test(*self._create_poses(spline, backward)).any()
+        return bool(self.test(*self._create_poses(spline, backward)).any())
 
     def get_distance(self, x, y, yaw) -> np.ndarray:
-        row, col, layer = self.grid.to_3d_grid(x, y, yaw)
-        return ndimage.map_coordinates(self.dist_stack, [[row], [col], [layer]], order=0)
+        valid, rows, cols, layers = self._to_indices(x, y, yaw)
+        if self.compact:
+            assert self.quantized_dist_stack is not None
+            return np.where(valid, self.quantized_dist_stack[layers, rows, cols] * DISTANCE_UNIT, 0.0)
+        assert self.dist_stack is not None
+        return np.where(valid, self.dist_stack[rows, cols, layers], 0.0)
 
     def get_minimum_spline_distance(self, spline, backward=False) -> float:
         return self.get_distance(*self._create_poses(spline, backward)).min()
+
+
+def has_areas(areas: list[Area]) -> bool:
+    """Whether the areas restrict the accessible region, i.e. whether the map is blocked outside of them."""
+    return any(len(a.outline) > 2 for a in areas)
+
+
+def _run_layers(function: Callable[[int], None], num_layers: int, deadline: Optional[float], message: str) -> None:
+    """Call the function for all layers in parallel and raise a `TimeoutError` if a layer finishes after the deadline.
+
+    The layers are independent and OpenCV as well as SciPy release the GIL, so threads are sufficient.
+    """
+    def run(layer: int) -> None:
+        function(layer)
+        if deadline and time.time() > deadline:
+            raise TimeoutError(message)
+
+    with ThreadPoolExecutor(NUM_THREADS, thread_name_prefix='obstacle_map') as pool:
+        futures = [pool.submit(run, layer) for layer in range(num_layers)]
+        try:
+            for future in futures:
+                future.result()
+        except BaseException:
+            pool.shutdown(wait=False, cancel_futures=True)
+            raise
+
+
+def _render_world(binary_renderer: BinaryRenderer,
+                  grid: Grid,
+                  areas: list[Area],
+                  obstacles: list[Obstacle],
+                  deadline: Optional[float]) -> None:
+    for area in areas:
+        binary_renderer.polygon(np.array([grid.to_grid(p.x, p.y)[::-1] for p in area.outline]), False)
+        if deadline and time.time() > deadline:
+            raise TimeoutError('obstacle map creation took too long')
+    for obstacle in obstacles:
+        binary_renderer.polygon(np.array([grid.to_grid(p.x, p.y)[::-1] for p in obstacle.outline]))
+        if deadline and time.time() > deadline:
+            raise TimeoutError('obstacle map creation took too long')
+
+
+def _gaps(indices: np.ndarray, region: slice) -> np.ndarray:
+    """Distance of each index to the given region (zero inside)."""
+    return np.maximum(np.maximum(region.start - indices, indices - (region.stop - 1)), 0)
+
+
+def _border_gaps(indices: np.ndarray, window: slice, size: int) -> np.ndarray:
+    """Distance of each index to the nearest cell outside of the window, ignoring the borders of the map."""
+    before = indices - window.start + 1 if window.start > 0 else np.full(len(indices), np.inf)
+    after = window.stop - indices if window.stop < size else np.full(len(indices), np.inf)
+    return np.minimum(before, after)
@@ -2,8 +2,10 @@ import asyncio
 import logging
 import time
 from copy import copy
+from dataclasses import replace
 from multiprocessing import Pipe
-from typing import Any
+from pathlib import Path
+from typing import Any, Optional
 
 from .. import persistence, rosys, run
 from ..driving import PathSegment
@@ -12,7 +14,8 @@ from ..geometry import Point, Pose, Prism, Spline
 from .area import Area
 from .obstacle import Obstacle
 from .planner_process import (PlannerCommand, PlannerGrowMapCommand, PlannerObstacleDistanceCommand, PlannerProcess,
-                              PlannerResponse, PlannerSearchCommand, PlannerTestCommand)
+                              PlannerResponse, PlannerSearchCommand, PlannerTestCommand, PlannerWorldUpdate,
+                              WorldOutOfSyncError)
 
 
 class PathPlanner(persistence.PersistentModule):
@@ -20,25 +23,44 @@ class PathPlanner(persistence.PersistentModule):
 
     If given, the algorithm respects the given robot shape as well as a dictionary of accessible areas and a dictionary of obstacles, both of which a backed up and restored automatically.
     The path planner can search paths, check if a spline interferes with obstacles and get the distance of a pose to any obstacle.
+    For large fields `compact_map` reduces the memory of the obstacle map considerably
+    at the cost of distances being rounded to centimeters.
+    If a `cache_path` is given, obstacle maps and graphs are cached on disk,
+    so they do not need to be computed again after a restart or when the world returns to a known state.
+
+    Areas and obstacles are only sent to the planner process when they changed;
+    queries just refer to the version of the world they expect.
+    Added, replaced and removed entries are detected automatically.
+    Areas and obstacles which are modified in place need to be announced via `AREAS_CHANGED` and `OBSTACLES_CHANGED`
+    (or `invalidate_world`).
     """
 
-    def __init__(self, robot_shape: Prism) -> None:
+    def __init__(self, robot_shape: Prism, *, compact_map: bool = False, cache_path: Optional[Path] = None) -> None:
         super().__init__()
 
         self.log = logging.getLogger('rosys.path_planner')
 
         self.connection, process_connection = Pipe()
-        self.process = PlannerProcess(process_connection, robot_shape.outline)
+        self.process = PlannerProcess(process_connection, robot_shape.outline,
+                                      compact_map=compact_map, cache_path=cache_path)
         self.responses: dict[str, Any] = {}
 
         self.obstacles: dict[str, Obstacle] = {}
         self.areas: dict[str, Area] = {}
+        self.world_version = 0
+        self._synced_obstacles: Optional[dict[str, Obstacle]] = None  # NOTE: None if the whole world has to be sent
+        self._synced_areas: Optional[dict[str, Area]] = None
+        self._modified_obstacle_ids: set[str] = set()
+        self._modified_area_ids: set[str] = set()
 
         self.OBSTACLES_CHANGED = Event()
         """the obstacles have changed (argument: dictionary of obstacles)"""
         self.AREAS_CHANGED = Event()
         """the areas have changed (argument: list of areas that have changed, can be None for all areas)"""
 
+        self.OBSTACLES_CHANGED.register(self._handle_obstacles_changed)
+        self.AREAS_CHANGED.register(self._handle_areas_changed)
+
         rosys.on_startup(self.startup)
         rosys.on_shutdown(self.shutdown)
         rosys.on_repeat(self.step, 0.1)
@@ -92,8 +114,7 @@ class PathPlanner(persistence.PersistentModule):
 
     async def search(self, *, start: Pose, goal: Pose, timeout: float = 3.0) -> list[PathSegment]:
         return await self._call(PlannerSearchCommand(
-            areas=list(self.areas.values()),
-            obstacles=list(self.obstacles.values()),
+            world_version=self._sync_world(),
             start=start,
             goal=goal,
             deadline=time.time()+timeout,
@@ -101,21 +122,70 @@ class PathPlanner(persistence.PersistentModule):
 
     async def test_spline(self, spline: Spline, timeout: float = 3.0) -> bool:
         return await self._call(PlannerTestCommand(
-            areas=list(self.areas.values()),
-            obstacles=list(self.obstacles.values()),
+            world_version=self._sync_world(),
             spline=spline,
             deadline=time.time()+timeout,
         ))
 
     async def get_obstacle_distance(self, pose: Pose, timeout: float = 3.0) -> float:
         return await self._call(PlannerObstacleDistanceCommand(
-            areas=list(self.areas.values()),
-            obstacles=list(self.obstacles.values()),
+            world_version=self._sync_world(),
             pose=pose,
             deadline=time.time()+timeout,
         ))
 
+    def invalidate_world(self) -> None:
+        """Send all areas and obstacles to the planner process with the next query."""
+        self._synced_areas = self._synced_obstacles = None
+
+    def _handle_obstacles_changed(self, _: dict[str, Obstacle]) -> None:
+        self._modified_obstacle_ids.update(self.obstacles)
+
+    def _handle_areas_changed(self, areas: Optional[list[Area]]) -> None:
+        self._modified_area_ids.update(self.areas if areas is None else [area.id for area in areas])
+
+    def _sync_world(self) -> int:
+        """Send all changes of areas and obstacles since the last sync to the planner process and return the new version."""
+        reset = self._synced_areas is None or self._synced_obstacles is None
+        synced_areas = {} if self._synced_areas is None or reset else self._synced_areas
+        synced_obstacles = {} if self._synced_obstacles is None or reset else self._synced_obstacles
+        # NOTE: only identities are compared; modifications in place are announced by the change events
+        areas = {area_id: area for area_id, area in self.areas.items()
+                 if area_id in self._modified_area_ids or synced_areas.get(area_id) is not area}
+        obstacles = {obstacle_id: obstacle for obstacle_id, obstacle in self.obstacles.items()
+                     if obstacle_id in self._modified_obstacle_ids or synced_obstacles.get(obstacle_id) is not obstacle}
+        removed_area_ids = [area_id for area_id in synced_areas if area_id not in self.areas]
+        removed_obstacle_ids = [obstacle_id for obstacle_id in synced_obstacles if obstacle_id not in self.obstacles]
+        self._modified_area_ids.clear()
+        self._modified_obstacle_ids.clear()
+        if not reset and not areas and not obstacles and not removed_area_ids and not removed_obstacle_ids:
+            return self.world_version
+        self.world_version += 1
+        self.connection.send(PlannerWorldUpdate(
+            version=self.world_version,
+            areas=areas,
+            removed_area_ids=removed_area_ids,
+            obstacles=obstacles,
+            removed_obstacle_ids=removed_obstacle_ids,
+            reset=reset,
+        ))
+        self._synced_areas = dict(self.areas)
+        self._synced_obstacles = dict(self.obstacles)
+        return self.world_version
+
     async def _call(self, command: PlannerCommand, check_interval: float = 0.1) -> Any:
+        result = await self._send(command, check_interval)
+        if isinstance(result, WorldOutOfSyncError) and \
+                isinstance(command, (PlannerSearchCommand, PlannerTestCommand, PlannerObstacleDistanceCommand)):
+            # NOTE: the planner process missed an update (e.g. because it failed), so the whole world is sent again
+            self.log.warning('resending the world to the planner process: %s', result)
+            self.invalidate_world()
+            result = await self._send(replace(command, world_version=self._sync_world()), check_interval)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    async def _send(self, command: PlannerCommand, check_interval: float) -> Any:
         with run.cpu():
             self.connection.send(command)
             while command.id not in self.responses:
@@ -124,7 +194,4 @@ class PathPlanner(persistence.PersistentModule):
                 if rosys.is_test:
                     await self.step()  # NOTE: otherwise step() is not called while awaiting response
                 await asyncio.sleep(check_interval)
-            result = self.responses.pop(command.id)
-            if isinstance(result, Exception):
-                raise result
-            return result
+            return self.responses.pop(command.id)
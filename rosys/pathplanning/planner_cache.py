@@ -0,0 +1,149 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+import networkx as nx
+import numpy as np
+
+from .. import persistence
+from ..geometry import Point, Pose
+from .area import Area
+from .delaunay_pose_group import DelaunayPoseGroup
+from .grid import Grid
+from .obstacle import Obstacle
+from .obstacle_map import ObstacleMap
+from .robot_renderer import RobotRenderer
+
+VERSION = 1
+"""Format version which is part of every key, so entries of older formats are not used anymore."""
+
+LAYERS = ['stack', 'dist_stack', 'packed_stack', 'quantized_dist_stack']
+
+
+@dataclass(slots=True, kw_only=True)
+class CacheEntry:
+    obstacle_map: ObstacleMap
+    tri_points: np.ndarray
+    pose_groups: list[DelaunayPoseGroup]
+    graph: nx.DiGraph
+
+
+class PlannerCache:
+    """Content-addressed on-disk cache of obstacle maps and planner graphs.
+
+    Entries are keyed by a hash of the robot outline, the areas, the obstacles and the grid parameters.
+    The layers of the obstacle map are stored as `.npy` files and loaded as copy-on-write memory maps,
+    so loading does not read them until they are accessed and changes are never written back.
+    The least recently used entries are deleted when there are more than `max_entries`.
+    """
+
+    def __init__(self, path: Path, *, max_entries: int = 3) -> None:
+        self.path = path.expanduser()
+        self.max_entries = max_entries
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.log = logging.getLogger('rosys.pathplanning.planner_cache')
+
+    @staticmethod
+    def key(robot_outline: list[tuple[float, float]],
+            areas: list[Area],
+            obstacles: list[Obstacle],
+            grid: Grid,
+            compact: bool) -> str:
+        # NOTE: the order of areas and obstacles does not change the map
+        content = {
+            'version': VERSION,
+            'robot_outline': [list(point) for point in robot_outline],
+            'areas': sorted(json.dumps(persistence.to_dict(area), sort_keys=True) for area in areas),
+            'obstacles': sorted(json.dumps(persistence.to_dict(obstacle), sort_keys=True) for obstacle in obstacles),
+            'grid': [list(grid.size), list(grid.bbox)],
+            'compact': compact,
+        }
+        return hashlib.sha256(json.dumps(content).encode()).hexdigest()
+
+    def load(self, key: str, robot_outline: list[tuple[float, float]]) -> Optional[CacheEntry]:
+        entry_path = self.path / key
+        if not entry_path.is_dir():
+            return None
+        try:
+            meta = json.loads((entry_path / 'meta.json').read_text())
+            grid = Grid(tuple(meta['grid_size']), tuple(meta['grid_bbox']))
+            layers = {name: np.load(entry_path / f'{name}.npy', mmap_mode='c')
+                      for name in LAYERS if (entry_path / f'{name}.npy').exists()}
+            obstacle_map = ObstacleMap(grid, np.load(entry_path / 'map.npy'), RobotRenderer(robot_outline),
+                                       compact=meta['compact'], layers=layers)
+            tri_points = np.load(entry_path / 'tri_points.npy')
+            neighbor_offsets = np.load(entry_path / 'neighbor_offsets.npy')
+            neighbors = np.load(entry_path / 'neighbors.npy')
+            edges = np.load(entry_path / 'edges.npy')
+            backward = np.load(entry_path / 'backward.npy')
+            weights = np.load(entry_path / 'weights.npy')
+        except (OSError, ValueError, KeyError):
+            self.log.exception('could not load cache entry %s', key)
+            shutil.rmtree(entry_path, ignore_errors=True)
+            return None
+        os.utime(entry_path)
+
+        pose_groups = []
+        for i, point in enumerate(tri_points):
+            neighbor_indices = neighbors[neighbor_offsets[i]:neighbor_offsets[i + 1]]
+            pose_groups.append(DelaunayPoseGroup(
+                index=i,
+                point=Point(x=point[0], y=point[1]),
+                neighbor_indices=neighbor_indices.tolist(),
+                poses=[
+                    Pose(x=point[0], y=point[1], yaw=np.arctan2(neighbor[1] - point[1], neighbor[0] - point[0]))
+                    for neighbor in tri_points[neighbor_indices]
+                ],
+            ))
+        graph = nx.DiGraph()
+        graph.add_nodes_from((g, p) for g, group in enumerate(pose_groups) for p in range(len(group.poses)))
+        graph.add_edges_from(((g, p), (g_, p_), {'backward': b, 'weight': w})
+                             for (g, p, g_, p_), b, w in zip(edges.tolist(), backward.tolist(), weights.tolist()))
+        return CacheEntry(obstacle_map=obstacle_map, tri_points=tri_points, pose_groups=pose_groups, graph=graph)
+
+    def save(self, key: str, entry: CacheEntry) -> None:
+        entry_path = self.path / key
+        if entry_path.exists():
+            return
+        temp_path = self.path / f'{key}.{uuid.uuid4().hex}.tmp'
+        temp_path.mkdir()
+        try:
+            obstacle_map = entry.obstacle_map
+            (temp_path / 'meta.json').write_text(json.dumps({
+                'grid_size': list(obstacle_map.grid.size),
+                'grid_bbox': list(obstacle_map.grid.bbox),
+                'compact': obstacle_map.compact,
+            }))
+            np.save(temp_path / 'map.npy', obstacle_map.map)
+            for name in LAYERS:
+                array = getattr(obstacle_map, name)
+                if array is not None:
+                    np.save(temp_path / f'{name}.npy', array)
+            np.save(temp_path / 'tri_points.npy', entry.tri_points)
+            np.save(temp_path / 'neighbor_offsets.npy',
+                    np.cumsum([0] + [len(group.neighbor_indices) for group in entry.pose_groups]))
+            np.save(temp_path / 'neighbors.npy',
+                    np.array([g for group in entry.pose_groups for g in group.neighbor_indices], dtype=np.int64))
+            edges = list(entry.graph.edges(data=True))
+            np.save(temp_path / 'edges.npy', np.array([(*u, *v) for u, v, _ in edges], dtype=np.int32).reshape(-1, 4))
+            np.save(temp_path / 'backward.npy', np.array([data['backward'] for _, _, data in edges], dtype=bool))
+            np.save(temp_path / 'weights.npy', np.array([data['weight'] for _, _, data in edges], dtype=float))
+            temp_path.rename(entry_path)
+        except OSError:
+            self.log.exception('could not save cache entry %s', key)
+            shutil.rmtree(temp_path, ignore_errors=True)
+            return
+        self.prune()
+
+    def prune(self) -> None:
+        """Delete the least recently used entries if there are more than `max_entries`."""
+        entries = sorted((p for p in self.path.iterdir() if p.is_dir() and not p.name.endswith('.tmp')),
+                         key=lambda p: p.stat().st_mtime)
+        for entry_path in entries[:max(len(entries) - self.max_entries, 0)]:
+            shutil.rmtree(entry_path, ignore_errors=True)
@@ -1,10 +1,11 @@
 import abc
 import logging
 import uuid
-from dataclasses import dataclass, field
+from dataclasses import dataclass, field, replace
 from multiprocessing import Process
 from multiprocessing.connection import Connection
-from typing import Any
+from pathlib import Path
+from typing import Any, Optional
 
 from ..geometry import Point, Pose, Spline
 from .area import Area
@@ -21,12 +22,32 @@ class PlannerCommand(abc.ABC):
         self.id = str(uuid.uuid4())
 
 
+@dataclass
+class PlannerWorldUpdate:
+    """Changed and removed areas and obstacles which bring the world of the planner process to the given version.
+
+    If `reset` is set, the world is cleared before the changes are applied.
+    """
+    version: int
+    areas: dict[str, Area] = field(default_factory=dict)
+    removed_area_ids: list[str] = field(default_factory=list)
+    obstacles: dict[str, Obstacle] = field(default_factory=dict)
+    removed_obstacle_ids: list[str] = field(default_factory=list)
+    reset: bool = False
+
+
+class WorldOutOfSyncError(RuntimeError):
+    pass
+
+
 @dataclass
 class PlannerSearchCommand(PlannerCommand):
-    areas: list[Area]
-    obstacles: list[Obstacle]
     start: Pose
     goal: Pose
+    areas: list[Area] = field(default_factory=list)
+    obstacles: list[Obstacle] = field(default_factory=list)
+    world_version: Optional[int] = None
+    """if given, the world of the planner process is used instead of `areas` and `obstacles`"""
 
 
 @dataclass
@@ -36,18 +57,22 @@ class PlannerGrowMapCommand(PlannerCommand):
 
 @dataclass
 class PlannerTestCommand(PlannerCommand):
-    areas: list[Area]
-    obstacles: list[Obstacle]
     spline: Spline
     backward: bool = False
+    areas: list[Area] = field(default_factory=list)
+    obstacles: list[Obstacle] = field(default_factory=list)
+    world_version: Optional[int] = None
+    """if given, the world of the planner process is used instead of `areas` and `obstacles`"""
 
 
 @dataclass
 class PlannerObstacleDistanceCommand(PlannerCommand):
-    areas: list[Area]
-    obstacles: list[Obstacle]
     pose: Pose
     backward: bool = False
+    areas: list[Area] = field(default_factory=list)
+    obstacles: list[Obstacle] = field(default_factory=list)
+    world_version: Optional[int] = None
+    """if given, the world of the planner process is used instead of `areas` and `obstacles`"""
 
 
 @dataclass
@@ -59,11 +84,15 @@ class PlannerResponse:
 
 class PlannerProcess(Process):
 
-    def __init__(self, connection: Connection, robot_outline: list[tuple[float, float]]) -> None:
+    def __init__(self, connection: Connection, robot_outline: list[tuple[float, float]], *,
+                 compact_map: bool = False, cache_path: Optional[Path] = None) -> None:
         super().__init__()
         self.log = logging.getLogger('rosys.pathplanning.PlannerProcess')
         self.connection = connection
-        self.planner = DelaunayPlanner(robot_outline)
+        self.planner = DelaunayPlanner(robot_outline, compact_map=compact_map, cache_path=cache_path)
+        self.areas: dict[str, Area] = {}
+        self.obstacles: dict[str, Obstacle] = {}
+        self.world_version = 0
 
     def run(self) -> None:
         while True:
@@ -72,26 +101,58 @@ class PlannerProcess(Process):
             except (EOFError, KeyboardInterrupt):
                 self.log.info('PlannerProcess stopped')
                 return
+            if isinstance(cmd, PlannerWorldUpdate):
+                try:
+                    self.update_world(cmd)
+                except Exception:
+                    self.log.exception('failed to update world to version %s', cmd.version)
+                continue
             try:
                 if isinstance(cmd, PlannerSearchCommand):
-                    self.log.info(cmd)
+                    areas, obstacles = self.get_world(cmd)
+                    self.log.info(replace(cmd, areas=areas, obstacles=obstacles, world_version=None))
                     additional_points = [cmd.start.point, cmd.goal.point]
-                    self.planner.update_map(cmd.areas, cmd.obstacles, additional_points, cmd.deadline)
+                    self.planner.update_map(areas, obstacles, additional_points, cmd.deadline,
+                                            world_version=cmd.world_version)
                     self.respond(cmd, self.planner.search(cmd.start, cmd.goal))
                 if isinstance(cmd, PlannerGrowMapCommand):
                     self.planner.grow_map(cmd.points, cmd.deadline)
                     self.respond(cmd, None)
                 if isinstance(cmd, PlannerTestCommand):
-                    self.planner.update_map(cmd.areas, cmd.obstacles, [cmd.spline.start, cmd.spline.end], cmd.deadline)
+                    areas, obstacles = self.get_world(cmd)
+                    self.planner.update_map(areas, obstacles, [cmd.spline.start, cmd.spline.end], cmd.deadline,
+                                            world_version=cmd.world_version)
                     assert self.planner.obstacle_map is not None
                     self.respond(cmd, bool(self.planner.obstacle_map.test_spline(cmd.spline, cmd.backward)))
                 if isinstance(cmd, PlannerObstacleDistanceCommand):
-                    self.planner.update_map(cmd.areas, cmd.obstacles, [cmd.pose.point], cmd.deadline)
+                    areas, obstacles = self.get_world(cmd)
+                    self.planner.update_map(areas, obstacles, [cmd.pose.point], cmd.deadline,
+                                            world_version=cmd.world_version)
                     assert self.planner.obstacle_map is not None
                     self.respond(cmd, self.planner.obstacle_map.get_distance(cmd.pose.x, cmd.pose.y, cmd.pose.yaw))
             except Exception as e:
                 self.log.exception('failed to compute cmd "%s"', cmd)
                 self.respond(cmd, e)
 
+    def update_world(self, update: PlannerWorldUpdate) -> None:
+        if update.reset:
+            self.areas.clear()
+            self.obstacles.clear()
+        for area_id in update.removed_area_ids:
+            self.areas.pop(area_id, None)
+        for obstacle_id in update.removed_obstacle_ids:
+            self.obstacles.pop(obstacle_id, None)
+        self.areas.update(update.areas)
+        self.obstacles.update(update.obstacles)
+        self.world_version = update.version
+
+    def get_world(self, cmd: PlannerSearchCommand | PlannerTestCommand | PlannerObstacleDistanceCommand) \
+            -> tuple[list[Area], list[Obstacle]]:
+        if cmd.world_version is None:
+            return cmd.areas, cmd.obstacles
+        if cmd.world_version != self.world_version:
+            raise WorldOutOfSyncError(f'expected world version {cmd.world_version}, but have {self.world_version}')
+        return list(self.areas.values()), list(self.obstacles.values())
+
     def respond(self, cmd: PlannerCommand, content: Any) -> None:
         self.connection.send(PlannerResponse(cmd.id, cmd.deadline, content))
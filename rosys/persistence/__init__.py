@@ -1,14 +1,20 @@
 from dataclasses_json import Exclude, config
 
+from .backends import Backend, FastJsonBackend, JsonBackend, MsgpackBackend
 from .backup_schedule import BackupSchedule
 from .converters import from_dict, replace_dataclass, replace_dict, replace_list, replace_set, to_dict
 from .persistent_module import PersistentModule
-from .registry import backup, restore, write_export
+from .registry import backup, restore, set_backend, write_export
+from .snapshot_store import SnapshotStore
 from .ui import export_button, import_button
 
 exclude: dict[str, dict] = config(exclude=Exclude.ALWAYS)
 
 __all__ = [
+    'Backend',
+    'FastJsonBackend',
+    'JsonBackend',
+    'MsgpackBackend',
     'BackupSchedule',
     'from_dict',
     'replace_dataclass',
@@ -17,9 +23,11 @@ __all__ = [
     'replace_set',
     'to_dict',
     'PersistentModule',
+    'SnapshotStore',
     'exclude',
     'backup',
     'restore',
+    'set_backend',
     'write_export',
     'export_button',
     'import_button',
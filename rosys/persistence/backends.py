@@ -0,0 +1,74 @@
+import abc
+import json
+from typing import Any
+
+import msgpack
+import numpy as np
+import ujson
+
+
+class Encoder(json.JSONEncoder):
+
+    def default(self, o):
+        if isinstance(o, np.floating):
+            return float(o)
+        return json.JSONEncoder.default(self, o)
+
+
+def _default(o: Any) -> Any:
+    if isinstance(o, np.floating):
+        return float(o)
+    raise TypeError(f'Object of type {type(o).__name__} is not serializable')
+
+
+class Backend(abc.ABC):
+    """Serialization format of persistence snapshots."""
+    suffix: str
+
+    @abc.abstractmethod
+    def dumps(self, data: Any) -> bytes:
+        pass
+
+    @abc.abstractmethod
+    def loads(self, raw: bytes) -> Any:
+        pass
+
+
+class JsonBackend(Backend):
+    """Human-readable, indented JSON (default)."""
+    suffix = '.json'
+
+    def dumps(self, data: Any) -> bytes:
+        return json.dumps(data, indent=4, cls=Encoder).encode()
+
+    def loads(self, raw: bytes) -> Any:
+        return json.loads(raw)
+
+
+class FastJsonBackend(Backend):
+    """Compact JSON written and read with ujson."""
+    suffix = '.json'
+
+    def dumps(self, data: Any) -> bytes:
+        return ujson.dumps(data, default=_default).encode()
+
+    def loads(self, raw: bytes) -> Any:
+        return ujson.loads(raw)
+
+
+class MsgpackBackend(Backend):
+    """Compact binary format."""
+    suffix = '.msgpack'
+
+    def dumps(self, data: Any) -> bytes:
+        return msgpack.packb(data, default=_default, use_bin_type=True)
+
+    def loads(self, raw: bytes) -> Any:
+        return msgpack.unpackb(raw, raw=False, strict_map_key=False)
+
+
+BACKENDS: dict[str, type[Backend]] = {
+    'json': JsonBackend,
+    'fast_json': FastJsonBackend,
+    'msgpack': MsgpackBackend,
+}
@@ -1,38 +1,76 @@
 import datetime
+import json
 import logging
+import re
 from pathlib import Path
+from typing import Any
 
 import rosys
 
+from .. import run
 from . import registry
+from .snapshot_store import SnapshotStore
+
+LEGACY_LABEL = re.compile(r'\d{4}-\d{2}-\d{2}')
+"""daily export files written by earlier versions are named after their date"""
 
 
 class BackupSchedule:
-    """The BackupSchedule module is responsible for backing up the persistence files every day at the specified time."""
+    """The BackupSchedule module is responsible for backing up the persistence files every day at the specified time.
+
+    The daily snapshots are kept in a deduplicated and compressed `SnapshotStore`,
+    so module data which did not change since the previous day does not take up additional space.
+    """
 
     def __init__(self,
                  path: Path = Path('~/.rosys_backup'),
                  time: datetime.time = datetime.time(3, 0),
                  backup_count: int = 100) -> None:
         self.path = path.expanduser()
-        self.path.mkdir(parents=True, exist_ok=True)
+        self.store = SnapshotStore(self.path)
         self.time = time
         self.backup_count = backup_count
         self.log = logging.getLogger('rosys.persistence')
 
         rosys.on_repeat(self.backup, 60)
 
-    def backup(self) -> None:
+    async def backup(self) -> None:
         """Backup the persistence files every day at the specified time."""
         now = datetime.datetime.now()
-        filepath = self.path / f'{now:%Y-%m-%d}.json'
-        if now.time() < self.time or filepath.exists():
+        label = f'{now:%Y-%m-%d}'
+        if now.time() < self.time or self.store.contains(label):
             return
-        self.log.info('Backing up persistence files to %s', filepath)
-        registry.write_export(filepath)
-        self.prune()
+        self.log.info('Backing up persistence files to %s', self.path)
+        data = registry.export()
+        written = await run.io_bound(self.store.save, label, data)
+        self.log.info('Wrote %s bytes for backup %s', written, label)
+        await run.io_bound(self.prune)
 
     def prune(self) -> None:
-        """Delete old backups if there are more than the specified number."""
-        while len(backups := sorted(self.path.glob('*.json'))) > self.backup_count:
-            backups[0].unlink()
+        """Delete old backups if there are more than the specified number.
+
+        Daily export files written by earlier versions count as backups and are deleted as well.
+        """
+        legacy_labels = set(self._legacy_backups())
+        labels = sorted(legacy_labels | set(self.store.labels()))
+        for label in labels[:max(len(labels) - self.backup_count, 0)]:
+            if label in legacy_labels:
+                self._legacy_path(label).unlink(missing_ok=True)
+            self.store.delete(label)
+        self.store.collect_garbage()
+
+    def labels(self) -> list[str]:
+        """Dates of all available backups."""
+        return sorted(set(self._legacy_backups()) | set(self.store.labels()))
+
+    def load(self, label: str) -> dict[str, Any]:
+        """Load the backup of the given date (module name -> data)."""
+        if not self.store.contains(label) and self._legacy_path(label).exists():
+            return json.loads(self._legacy_path(label).read_text())
+        return self.store.load(label)
+
+    def _legacy_backups(self) -> list[str]:
+        return [p.stem for p in self.path.glob('*.json') if LEGACY_LABEL.fullmatch(p.stem)]
+
+    def _legacy_path(self, label: str) -> Path:
+        return self.path / f'{label}.json'
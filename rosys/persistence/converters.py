@@ -1,21 +1,196 @@
+import enum
 import logging
-from dataclasses import fields
-from typing import Any
+import types
+import typing
+from dataclasses import MISSING, fields, is_dataclass
+from functools import partial
+from typing import Any, Callable
 
+from dataclasses_json import Exclude
 from dataclasses_json.core import _asdict, _decode_dataclass
 
 log = logging.getLogger('rosys.persistence.converters')
 
+_PRIMITIVES = {str, int, float, bool, type(None)}
+
+
+class _Unsupported(Exception):
+    pass
+
+
+class _Codec:
+    """Encoding and decoding functions for a dataclass which are generated once per type.
+
+    Dataclasses with features which are not covered (e.g. custom encoders or letter case) fall back to dataclasses_json.
+    """
+
+    def __init__(self, cls: type) -> None:
+        self.cls = cls
+        self.encode: Callable[[Any], dict[str, Any]] = partial(_asdict, encode_json=False)
+        self.decode: Callable[[dict[str, Any]], Any] = partial(_decode_dataclass, cls, infer_missing=False)
+
+    def compile(self) -> None:
+        try:
+            self.encode, self.decode = _Generator(self.cls).generate()
+        except _Unsupported as e:
+            log.debug('using dataclasses_json for %s (%s)', self.cls, e)
+
+
+_codecs: dict[type, _Codec] = {}
+
+
+def _codec(cls: type) -> _Codec:
+    codec = _codecs.get(cls)
+    if codec is None:
+        codec = _codecs[cls] = _Codec(cls)
+        codec.compile()  # NOTE: the codec is registered first to support recursive dataclasses
+    return codec
+
+
+class _Generator:
+    """Generates the source code of specialized `encode` and `decode` functions for a dataclass."""
+
+    def __init__(self, cls: type) -> None:
+        self.cls = cls
+        self.namespace: dict[str, Any] = {
+            '_cls': cls, '_encode': _encode, '_PRIMITIVES': _PRIMITIVES, '_MISSING': MISSING,
+        }
+        self.depth = 0
+
+    def generate(self) -> tuple[Callable, Callable]:
+        if not is_dataclass(self.cls):
+            raise _Unsupported('not a dataclass')
+        if getattr(self.cls, 'dataclass_json_config', None):
+            raise _Unsupported('dataclass_json config')
+        try:
+            hints = typing.get_type_hints(self.cls)
+        except Exception as e:
+            raise _Unsupported(f'unresolved type hints: {e}') from e
+        encode_lines = ['def encode(obj):', '    result = {}']
+        decode_lines = ['def decode(d):', '    if isinstance(d, _cls):', '        return d']
+        arguments: list[str] = []
+        for i, field in enumerate(fields(self.cls)):
+            config = field.metadata.get('dataclasses_json', {})
+            if set(config) - {'exclude'}:
+                raise _Unsupported(f'field config {config}')
+            exclude = config.get('exclude')
+            if exclude is not Exclude.ALWAYS:
+                encode_lines.append(f'    v = obj.{field.name}')
+                indent = '    '
+                if exclude is not None and exclude is not Exclude.NEVER:
+                    encode_lines.append(f'    if not {self._name("exclude", exclude)}(v):')
+                    indent += '    '
+                encode_lines.append(f'{indent}result[{field.name!r}] = {self._encoder(hints[field.name], "v")}')
+            if not field.init:
+                continue
+            expression = self._decoder(hints[field.name], 'v')
+            value = 'v' if expression == 'v' else f'None if v is None else {expression}'
+            if field.default is MISSING and field.default_factory is MISSING:
+                decode_lines.append(f'    v = d[{field.name!r}]')
+                decode_lines.append(f'    f{i} = {value}')
+            else:
+                default = self._name('default', field.default) if field.default is not MISSING else \
+                    f'{self._name("factory", field.default_factory)}()'
+                decode_lines.append(f'    v = d.get({field.name!r}, _MISSING)')
+                decode_lines.append(f'    f{i} = {default} if v is _MISSING else {value}')
+            arguments.append(f'{field.name}=f{i}')
+        encode_lines.append('    return result')
+        decode_lines.append(f'    return _cls({", ".join(arguments)})')
+        exec('\n'.join(encode_lines + [''] + decode_lines), self.namespace)  # pylint: disable=exec-used
+        return self.namespace['encode'], self.namespace['decode']
+
+    def _name(self, prefix: str, value: Any) -> str:
+        name = f'_{prefix}{len(self.namespace)}'
+        self.namespace[name] = value
+        return name
+
+    def _variable(self) -> str:
+        self.depth += 1
+        return f'x{self.depth}'
+
+    def _encoder(self, type_: Any, var: str) -> str:
+        """Create an expression which encodes `var`; values which do not match `type_` are handled by `_encode`."""
+        type_ = _strip(type_)
+        fallback = f'_encode({var})'
+        if isinstance(type_, type) and is_dataclass(type_):
+            return f'{self._name("codec", _codec(type_))}.encode({var}) if {var}.__class__ is {self._name("type", type_)} else {fallback}'
+        origin = typing.get_origin(type_)
+        args = typing.get_args(type_)
+        if origin in (list, set, frozenset, tuple) and args:
+            item = self._variable()
+            return f'[{self._encoder(args[0], item)} for {item} in {var}] if {var}.__class__ is list else {fallback}'
+        if origin is dict and len(args) == 2 and args[0] is str:
+            item = self._variable()
+            return f'{{k: {self._encoder(args[1], item)} for k, {item} in {var}.items()}} if {var}.__class__ is dict else {fallback}'
+        return f'{var} if {var}.__class__ in _PRIMITIVES else {fallback}'
+
+    def _decoder(self, type_: Any, var: str) -> str:
+        """Create an expression which decodes the serializable value `var` into `type_`."""
+        type_ = _strip(type_)
+        if type_ in _PRIMITIVES or type_ is Any or typing.get_origin(type_) is typing.Literal:
+            return var
+        if isinstance(type_, type) and is_dataclass(type_):
+            return f'{self._name("codec", _codec(type_))}.decode({var})'
+        if isinstance(type_, type) and issubclass(type_, enum.Enum):
+            name = self._name('type', type_)
+            return f'({var} if isinstance({var}, {name}) else {name}({var}))'
+        origin = typing.get_origin(type_)
+        args = typing.get_args(type_)
+        if origin in (list, set, frozenset) and len(args) == 1 or origin is tuple and len(args) == 2 and args[1] is Ellipsis:
+            item = self._variable()
+            expression = self._optional(args[0], item)
+            if expression == item:
+                return f'{origin.__name__}({var})'
+            return f'{origin.__name__}({expression} for {item} in {var})' if origin is not list else \
+                f'[{expression} for {item} in {var}]'
+        if origin is dict and len(args) == 2:
+            key_type = _strip(args[0])
+            if key_type not in (str, int, float, Any):
+                raise _Unsupported(type_)
+            key = 'k' if key_type in (str, Any) else f'{key_type.__name__}(k)'
+            item = self._variable()
+            return f'{{{key}: {self._optional(args[1], item)} for k, {item} in {var}.items()}}'
+        raise _Unsupported(type_)
+
+    def _optional(self, type_: Any, var: str) -> str:
+        expression = self._decoder(type_, var)
+        return var if expression == var else f'(None if {var} is None else {expression})'
+
+
+def _strip(type_: Any) -> Any:
+    """Remove NewType and Optional wrappers (`None` values are handled separately)."""
+    while hasattr(type_, '__supertype__'):
+        type_ = type_.__supertype__
+    if typing.get_origin(type_) in (typing.Union, types.UnionType):
+        args = [arg for arg in typing.get_args(type_) if arg is not type(None)]
+        if len(args) != 1:
+            raise _Unsupported(type_)
+        return _strip(args[0])
+    return type_
+
+
+def _encode(obj: Any) -> Any:
+    cls = type(obj)
+    if cls in _PRIMITIVES:
+        return obj
+    if cls in _codecs or (is_dataclass(obj) and not isinstance(obj, type)):
+        return _codec(cls).encode(obj)
+    if cls is list or cls is tuple or cls is set:
+        return [_encode(item) for item in obj]
+    if cls is dict:
+        return {_encode(key): _encode(value) for key, value in obj.items()}
+    return _asdict(obj, False)
+
 
 def to_dict(obj: Any) -> dict[str, Any]:
     """Convert an object `obj` to a serializable dict."""
-    return _asdict(obj, False)
+    return _encode(obj)
 
 
 def from_dict(cls: type, d: dict[str, Any]) -> Any:
     """Convert a serializable dict `d` to object of type `cls`."""
     try:
-        return _decode_dataclass(cls, d, False)
+        return _codec(cls).decode(d)
     except Exception:
         log.exception('Failed to decode %s from %s', cls, d)
         raise
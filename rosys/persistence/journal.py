@@ -0,0 +1,244 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+import pickle
+from pathlib import Path
+from typing import Any, Optional
+
+from .backends import BACKENDS, Backend, Encoder, JsonBackend
+
+log = logging.getLogger('rosys.persistence.journal')
+
+DICT = '<dict>'
+LIST = '<list>'
+GENERATION = '__generation__'
+
+
+class WriteBatch:
+    """Files written during one backup cycle which are synced to disk together and then committed.
+
+    New snapshots are first written to temporary files which are only renamed after all files have been synced,
+    so a crash never leaves a partially written snapshot or journal behind.
+    """
+
+    def __init__(self, *, sync: bool = True) -> None:
+        self.sync = sync
+        self._appended: list[Path] = []
+        self._snapshots: list[tuple[Path, Path, Path]] = []  # NOTE: (temporary file, snapshot, journal)
+
+    def append(self, filepath: Path) -> None:
+        self._appended.append(filepath)
+
+    def stage(self, temp_filepath: Path, snapshot_path: Path, journal_path: Path) -> None:
+        self._snapshots.append((temp_filepath, snapshot_path, journal_path))
+
+    def commit(self) -> None:
+        if self.sync:
+            for filepath in self._appended + [temp_filepath for temp_filepath, _, _ in self._snapshots]:
+                _fsync(filepath)
+        for temp_filepath, snapshot_path, journal_path in self._snapshots:
+            temp_filepath.rename(snapshot_path)
+            # NOTE: if the process dies before the journal is deleted, it is ignored because of its older generation
+            journal_path.unlink(missing_ok=True)
+            _remove_other_snapshots(snapshot_path)
+        if self.sync and self._snapshots:
+            for directory in {snapshot_path.parent for _, snapshot_path, _ in self._snapshots}:
+                _fsync(directory)
+        self._appended.clear()
+        self._snapshots.clear()
+
+
+def _remove_other_snapshots(snapshot_path: Path) -> None:
+    """Remove snapshots of other backends which would otherwise be restored after switching back."""
+    for suffix in {backend.suffix for backend in BACKENDS.values()} - {snapshot_path.suffix}:
+        snapshot_path.with_suffix(suffix).unlink(missing_ok=True)
+
+
+def _fsync(path: Path) -> None:
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class Journal:
+    """Append-only journal of changes to the backup of a persistent module.
+
+    The backup consists of a full snapshot (written by the given backend) and a journal file with one JSON line per change.
+    Dictionaries and lists in the first two levels of the backup are tracked entry by entry,
+    so changing a single obstacle or KPI day only appends a single line instead of rewriting the whole file.
+    The journal is compacted into a new snapshot once it gets too long.
+    Every snapshot has a generation which is also written to the first line of its journal,
+    so a journal which has not been deleted after writing a newer snapshot is not replayed on top of it.
+    """
+
+    def __init__(self, snapshot_path: Path, *, backend: Optional[Backend] = None, max_entries: int = 1000) -> None:
+        self.backend = backend or JsonBackend()
+        self.snapshot_path = snapshot_path.with_suffix(self.backend.suffix)
+        self.journal_path = snapshot_path.with_suffix('.journal')
+        self.max_entries = max_entries
+        self.entry_count = 0
+        self.generation = 0
+        self._entries: Optional[dict[tuple, bytes | str]] = None  # NOTE: fingerprints of the state written last
+
+    def write(self, data: dict[str, Any], *, compact: bool = False, batch: Optional[WriteBatch] = None) -> int:
+        """Write the changes since the last write and return the number of bytes written.
+
+        If a batch is given, new snapshots are only committed together with the batch.
+        """
+        entries = _flatten(data)
+        if self._entries is None or compact or not self.snapshot_path.exists():
+            return self._write_snapshot(data, entries, batch)
+        lines = _diff(self._entries, entries, data)
+        if not lines:
+            return 0
+        header = [] if self.journal_path.exists() else [json.dumps({'generation': self.generation})]
+        content = ''.join(line + '\n' for line in header + lines).encode()
+        with self.journal_path.open('ab') as f:
+            f.write(content)
+        if batch:
+            batch.append(self.journal_path)
+        self._entries = entries
+        self.entry_count += len(lines)
+        if self.entry_count > self.max_entries or self.journal_path.stat().st_size > self.snapshot_path.stat().st_size:
+            return len(content) + self._write_snapshot(data, entries, batch)
+        return len(content)
+
+    def read(self) -> Optional[dict[str, Any]]:
+        """Read the snapshot and replay the journal (returns `None` if there is no snapshot)."""
+        for backend in [self.backend] + [b() for b in BACKENDS.values() if b.suffix != self.backend.suffix]:
+            filepath = self.snapshot_path.with_suffix(backend.suffix)
+            if filepath.exists():
+                data = backend.loads(filepath.read_bytes())
+                break
+        else:
+            return None
+        self.generation = data.pop(GENERATION, 0)
+        self.entry_count = 0
+        corrupted = False
+        if self.journal_path.exists():
+            content = self.journal_path.read_text()
+            if content and not content.endswith('\n'):
+                corrupted = True  # NOTE: the last line has been torn by a crash while appending
+            lines = content.splitlines()
+            header = _parse_header(lines[0]) if lines else None
+            if header is not None:
+                lines = lines[1:]
+                if header != self.generation:
+                    log.warning('ignoring journal %s of generation %s (snapshot has generation %s)',
+                                self.journal_path, header, self.generation)
+                    lines = []
+                    corrupted = True
+            for line in lines:
+                try:
+                    _apply(data, json.loads(line))
+                    self.entry_count += 1
+                except Exception:
+                    log.warning('ignoring invalid journal entry in %s: %s', self.journal_path, line)
+                    corrupted = True
+        # NOTE: a snapshot of another backend or a corrupted or outdated journal is compacted with the next write
+        # (appending to a torn line would merge it with the next entry)
+        self._entries = _flatten(data) if filepath == self.snapshot_path and not corrupted else None
+        return data
+
+    def _write_snapshot(self, data: dict[str, Any], entries: dict[tuple, bytes | str], batch: Optional[WriteBatch]) -> int:
+        temp_filepath = self.snapshot_path.with_suffix('.tmp')
+        content = self.backend.dumps({**data, GENERATION: self.generation + 1})
+        try:
+            temp_filepath.write_bytes(content)
+        except Exception:
+            if temp_filepath.exists():
+                temp_filepath.unlink()
+            raise
+        if batch:
+            batch.stage(temp_filepath, self.snapshot_path, self.journal_path)
+        else:
+            temp_filepath.rename(self.snapshot_path)
+            self.journal_path.unlink(missing_ok=True)
+            _remove_other_snapshots(self.snapshot_path)
+        self._entries = entries
+        self.entry_count = 0
+        self.generation += 1
+        return len(content)
+
+
+def _parse_header(line: str) -> Optional[int]:
+    """Return the generation if the line is the header of a journal."""
+    try:
+        entry = json.loads(line)
+    except ValueError:
+        return None
+    return entry.get('generation') if isinstance(entry, dict) and 'path' not in entry else None
+
+
+def _flatten(data: dict[str, Any]) -> dict[tuple, bytes | str]:
+    """Fingerprint the first two levels of dictionaries and lists entry by entry.
+
+    Pickling is several times faster than JSON encoding, so only changed entries are encoded as JSON.
+    """
+    entries: dict[tuple, bytes | str] = {}
+    for key, value in data.items():
+        if isinstance(value, dict):
+            entries[(key,)] = DICT
+            for sub_key, sub_value in value.items():  # NOTE: JSON objects only have string keys
+                entries[(key, str(sub_key))] = _fingerprint(sub_value)
+        elif isinstance(value, list):
+            entries[(key,)] = LIST
+            for index, sub_value in enumerate(value):
+                entries[(key, index)] = _fingerprint(sub_value)
+        else:
+            entries[(key,)] = _fingerprint(value)
+    return entries
+
+
+def _fingerprint(value: Any) -> bytes:
+    try:
+        return pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+    except Exception:
+        return json.dumps(value, cls=Encoder).encode()
+
+
+def _diff(old: dict[tuple, bytes | str], new: dict[tuple, bytes | str], data: dict[str, Any]) -> list[str]:
+    lines: list[str] = []
+    replaced: set[tuple] = set()
+    for path, fingerprint in new.items():
+        if old.get(path) == fingerprint:
+            continue
+        if fingerprint in (DICT, LIST):
+            replaced.add(path)
+            lines.append(f'{{"path": {json.dumps(path)}, "container": "{fingerprint}"}}')
+        else:
+            lines.append(f'{{"path": {json.dumps(path)}, "value": {json.dumps(_lookup(data, path), cls=Encoder)}}}')
+    removed = [path for path in old if path not in new and path[:1] not in replaced and (len(path) == 1 or path[:1] in new)]
+    for path in sorted(removed, key=lambda p: p[1] if len(p) == 2 and isinstance(p[1], int) else -1, reverse=True):
+        lines.append(f'{{"path": {json.dumps(path)}, "delete": true}}')  # NOTE: list items are deleted from the end
+    return lines
+
+
+def _lookup(data: dict[str, Any], path: tuple) -> Any:
+    value = data[path[0]]
+    if len(path) == 1:
+        return value
+    if isinstance(value, list) or path[1] in value:
+        return value[path[1]]
+    return next(sub_value for sub_key, sub_value in value.items() if str(sub_key) == path[1])
+
+
+def _apply(data: dict[str, Any], entry: dict[str, Any]) -> None:
+    path = entry['path']
+    parent = data if len(path) == 1 else data[path[0]]
+    key = path[-1]
+    if entry.get('delete'):
+        if isinstance(parent, list):
+            del parent[key]
+        else:
+            parent.pop(key, None)
+    elif 'container' in entry:
+        parent[key] = {} if entry['container'] == DICT else []
+    elif isinstance(parent, list) and key == len(parent):
+        parent.append(entry['value'])
+    else:
+        parent[key] = entry['value']
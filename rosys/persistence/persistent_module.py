@@ -6,6 +6,10 @@ from . import registry
 
 class PersistentModule(abc.ABC):
     USE_PERSISTENCE: bool = True
+    LAZY_RESTORE: bool = False
+    """restore in the background after startup; call `ensure_restored` before accessing the data"""
+    BACKUP_INTERVAL: float = 0.0
+    """minimum time in seconds between two backups; further backup requests in between are coalesced"""
 
     def __init__(self, *, persistence_key: str | None = None, **kwargs) -> None:
         super().__init__(**kwargs)
@@ -24,3 +28,7 @@ class PersistentModule(abc.ABC):
     def request_backup(self) -> None:
         """Mark this module as changed and in need of a backup."""
         self.needs_backup = True
+
+    def ensure_restored(self) -> None:
+        """Restore the backup right away if this is still pending (only needed with `LAZY_RESTORE`)."""
+        registry.ensure_restored(self)
@@ -1,14 +1,20 @@
 from __future__ import annotations
 
+import asyncio
 import json
 import logging
+import time
+from dataclasses import dataclass
 from pathlib import Path
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Any, Optional
 
-import numpy as np
+from nicegui import background_tasks
 
+from .. import run
 from ..helpers import is_test
-from ..run import awaitable
+from ..run import Executor
+from .backends import Backend, JsonBackend
+from .journal import Journal, WriteBatch
 
 if TYPE_CHECKING:
     from .persistent_module import PersistentModule
@@ -16,6 +22,22 @@ if TYPE_CHECKING:
 log = logging.getLogger('rosys.persistence')
 backup_path = Path('~/.rosys').expanduser()
 modules: dict[str, PersistentModule] = {}
+journals: dict[str, Journal] = {}
+backend: Backend = JsonBackend()
+sync: bool = True  # NOTE: written backups are synced to disk once at the end of each backup cycle
+pending_restores: set[str] = set()  # NOTE: modules which must not be backed up before their data has been restored
+executor = Executor('persistence')  # NOTE: slow backups should not occupy the shared thread pool
+
+
+@dataclass(slots=True, kw_only=True)
+class BackupStats:
+    writes: int = 0
+    deferred: int = 0  # NOTE: backup cycles skipped because of the minimum backup interval
+    bytes_written: int = 0
+    last_backup: float = float('-inf')
+
+
+stats: dict[str, BackupStats] = {}
 
 
 def register(module: PersistentModule, key: str | None = None) -> None:
@@ -23,45 +45,109 @@ def register(module: PersistentModule, key: str | None = None) -> None:
         modules[key or module.__module__] = module
 
 
-class Encoder(json.JSONEncoder):
+def set_backend(backend_: Backend) -> None:
+    """Set the serialization format of future backups (existing backups of other formats are still restored)."""
+    global backend  # pylint: disable=global-statement
+    backend = backend_
+
+
+def _journal(name: str) -> Journal:
+    if name not in journals or journals[name].backend is not backend:
+        journals[name] = Journal(backup_path / f'{name}.json', backend=backend)
+    return journals[name]
 
-    def default(self, o):
-        if isinstance(o, np.floating):
-            return float(o)
-        return json.JSONEncoder.default(self, o)
 
+async def backup(force: bool = False) -> None:
+    await executor.submit(_backup, force)
 
-@awaitable
-def backup(force: bool = False) -> None:
+
+def _backup(force: bool) -> None:
+    batch = WriteBatch(sync=sync)
+    now = time.monotonic()
     for name, module in modules.items():
-        if not module.needs_backup and not force:
+        if not module.needs_backup and not force or name in pending_restores:
+            continue
+        module_stats = stats.setdefault(name, BackupStats())
+        if not force and now < module_stats.last_backup + module.BACKUP_INTERVAL:
+            module_stats.deferred += 1
             continue
         if not backup_path.exists():
             backup_path.mkdir(parents=True)
-        filepath = backup_path / f'{name}.json'
+        module.needs_backup = False  # NOTE: reset before creating the backup so that concurrent changes are not lost
         try:
-            temp_filepath = filepath.with_suffix('.tmp')
-            temp_filepath.write_text(json.dumps(module.backup(), indent=4, cls=Encoder))
-            temp_filepath.rename(filepath)
+            # NOTE: only changed entries are appended to the journal; forced backups write a full snapshot
+            written = _journal(name).write(module.backup(), compact=force, batch=batch)
         except Exception:
             log.exception('failed to backup %s: %s', module, str(module.backup()))
-            if temp_filepath.exists():
-                temp_filepath.unlink()
-        module.needs_backup = False
+            continue
+        module_stats.writes += 1
+        module_stats.bytes_written += written
+        module_stats.last_backup = now
+    try:
+        batch.commit()
+    except Exception:
+        log.exception('failed to commit backups')
+
+
+async def restore() -> None:
+    """Restore all modules.
+
+    The backups are read and parsed in parallel on worker threads while the data is applied on the event loop.
+    Modules with `LAZY_RESTORE` are restored in the background or as soon as `ensure_restored` is called.
+    """
+    pending_restores.update(modules)
+    await asyncio.gather(*(_restore(name) for name, module in modules.items() if not module.LAZY_RESTORE))
+    for name, module in modules.items():
+        if module.LAZY_RESTORE:
+            background_tasks.create(_restore(name), name=f'restore {name}')
 
 
-def restore() -> None:
-    for name, module in modules.items():
-        filepath = backup_path / f'{name}.json'
-        if not filepath.exists():
-            log.warning('Backup file "%s" not found.', filepath)
-            continue
-        try:
-            module.restore(json.loads(filepath.read_text()))
-        except Exception:
-            log.exception('failed to restore %s', module)
+def ensure_restored(module: PersistentModule) -> None:
+    for name, module_ in modules.items():
+        if module_ is module and name in pending_restores:
+            start = time.perf_counter()
+            _apply(name, _read(name), time.perf_counter() - start)
+
+
+async def _restore(name: str) -> None:
+    start = time.perf_counter()
+    data = await run.io_bound(_read, name)
+    if name in pending_restores:  # NOTE: the module might have been restored synchronously in the meantime
+        _apply(name, data, time.perf_counter() - start)
+
+
+def _read(name: str) -> Optional[dict[str, Any]]:
+    journal = _journal(name)
+    try:
+        data = journal.read()
+        if data is None:
+            log.warning('Backup file "%s" not found.', journal.snapshot_path)
+        return data
+    except Exception:
+        log.exception('failed to read backup of %s', name)
+        return None
+
+
+def _apply(name: str, data: Optional[dict[str, Any]], read_time: float) -> None:
+    pending_restores.discard(name)
+    if data is None:
+        return
+    start = time.perf_counter()
+    try:
+        modules[name].restore(data)
+    except Exception:
+        log.exception('failed to restore %s', modules[name])
+        return
+    log.info('restored %s in %.1f ms (reading %.1f ms, applying %.1f ms)',
+             name, (read_time + time.perf_counter() - start) * 1000, read_time * 1000, (time.perf_counter() - start) * 1000)
+
+
+def export() -> dict[str, Any]:
+    """Collect the backups of all modules (module name -> data)."""
+    for module in modules.values():
+        ensure_restored(module)
+    return {name: module.backup() for name, module in modules.items()}
 
 
 def write_export(to_filepath: Path) -> None:
-    data = {name: module.backup() for name, module in modules.items()}
-    to_filepath.write_text(json.dumps(data, indent=4))
+    to_filepath.write_text(json.dumps(export(), indent=4))
@@ -0,0 +1,88 @@
+import gzip
+import hashlib
+import json
+import logging
+from pathlib import Path
+from typing import Any
+
+from .backends import Encoder
+
+log = logging.getLogger('rosys.persistence.snapshot_store')
+
+
+class SnapshotStore:
+    """Content-addressed store for snapshots of all persistent modules.
+
+    Each module payload is stored once per content hash as compressed JSON in `objects/`.
+    A snapshot is a small manifest in `snapshots/` which maps module names to these hashes.
+    Payloads which did not change since an earlier snapshot are neither written nor stored again.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.objects_path = path / 'objects'
+        self.snapshots_path = path / 'snapshots'
+        self.objects_path.mkdir(parents=True, exist_ok=True)
+        self.snapshots_path.mkdir(parents=True, exist_ok=True)
+
+    def labels(self) -> list[str]:
+        """Sorted labels of all snapshots."""
+        return sorted(p.name.removesuffix('.json') for p in self.snapshots_path.glob('*.json'))
+
+    def contains(self, label: str) -> bool:
+        return self._manifest_path(label).exists()
+
+    def save(self, label: str, data: dict[str, Any]) -> int:
+        """Store a snapshot of `data` (module name -> payload) and return the number of bytes written."""
+        manifest: dict[str, str] = {}
+        written = 0
+        for name, payload in data.items():
+            # NOTE: the hash ignores the key order, but the payload is stored in its original order
+            canonical = json.dumps(payload, sort_keys=True, separators=(',', ':'), cls=Encoder).encode()
+            digest = hashlib.sha256(canonical).hexdigest()
+            manifest[name] = digest
+            object_path = self._object_path(digest)
+            if not object_path.exists():
+                raw = json.dumps(payload, separators=(',', ':'), cls=Encoder).encode()
+                written += _write_atomically(object_path, gzip.compress(raw))
+        written += _write_atomically(self._manifest_path(label), json.dumps(manifest, indent=4).encode())
+        return written
+
+    def load(self, label: str) -> dict[str, Any]:
+        """Load the snapshot with the given label (module name -> payload)."""
+        manifest = json.loads(self._manifest_path(label).read_text())
+        return {name: json.loads(gzip.decompress(self._object_path(digest).read_bytes()))
+                for name, digest in manifest.items()}
+
+    def export(self, label: str, filepath: Path) -> None:
+        """Write the snapshot as a single JSON file which can be imported with the import button."""
+        filepath.write_text(json.dumps(self.load(label), indent=4))
+
+    def delete(self, label: str) -> None:
+        self._manifest_path(label).unlink(missing_ok=True)
+
+    def collect_garbage(self) -> int:
+        """Delete all payloads which are not referenced by any snapshot and return their number."""
+        referenced: set[str] = set()
+        for manifest_path in self.snapshots_path.glob('*.json'):
+            referenced.update(json.loads(manifest_path.read_text()).values())
+        count = 0
+        for object_path in self.objects_path.glob('*/*.json.gz'):
+            if object_path.name.removesuffix('.json.gz') not in referenced:
+                object_path.unlink()
+                count += 1
+        return count
+
+    def _object_path(self, digest: str) -> Path:
+        return self.objects_path / digest[:2] / f'{digest}.json.gz'
+
+    def _manifest_path(self, label: str) -> Path:
+        return self.snapshots_path / f'{label}.json'
+
+
+def _write_atomically(filepath: Path, content: bytes) -> int:
+    filepath.parent.mkdir(parents=True, exist_ok=True)
+    temp_filepath = filepath.with_suffix('.tmp')
+    temp_filepath.write_bytes(content)
+    temp_filepath.rename(filepath)
+    return len(content)
@@ -1,3 +1,5 @@
+from __future__ import annotations
+
 import asyncio
 import gc
 import logging
@@ -6,21 +8,24 @@ import os
 import signal
 import threading
 import time as pytime
+import weakref
 from dataclasses import dataclass
 from typing import Any, Awaitable, Callable, Literal, Optional
 
 import numpy as np
-import psutil
 from nicegui import Client, app, background_tasks, ui
 
 from . import event, persistence, run
 from .config import Config
+from .garbage_collection import GarbageCollector
 from .helpers import invoke, is_stopping
 from .helpers import is_test as is_test_
+from .virtual_clock import VirtualClock
 
 log = logging.getLogger('rosys.core')
 
 config = Config()
+garbage_collector = GarbageCollector()
 translator: Optional[Any] = None
 
 is_test = is_test_()
@@ -42,8 +47,8 @@ NEW_NOTIFICATION = event.Event()
 
 class _state:
     start_time: float = 0.0 if is_test else pytime.time()
-    time = start_time
-    last_time_request: float = start_time
+    clock = VirtualClock(start_time)  # NOTE: only used in tests
+    time_base: tuple[float, float, float] = (start_time, pytime.monotonic(), 1.0)  # NOTE: (time, monotonic, speed)
     exception: Optional[BaseException] = None  # NOTE: used for tests
     startup_finished: bool = False
 
@@ -80,22 +85,36 @@ def notify(message: str,
                 log.exception('failed to call notify')
 
 
-time_lock = threading.Lock()
+time_lock = threading.Lock()  # NOTE: only needed when the simulation speed changes
 
 
 def time() -> float:
     if is_test:
-        return _state.time
+        return _state.clock.time
+    base_time, base_monotonic, speed = _state.time_base  # NOTE: the tuple is replaced atomically, so no lock is needed
+    if speed != config.simulation_speed:
+        return _change_time_speed()
+    return base_time + (pytime.monotonic() - base_monotonic) * speed
+
+
+def _change_time_speed() -> float:
     with time_lock:
-        now = pytime.time()
-        _state.time += (now - _state.last_time_request) * config.simulation_speed
-        _state.last_time_request = now
-        return _state.time
+        base_time, base_monotonic, speed = _state.time_base
+        now = pytime.monotonic()
+        current_time = base_time + (now - base_monotonic) * speed
+        _state.time_base = (current_time, now, config.simulation_speed)
+        return current_time
 
 
 def set_time(value: float) -> None:
     assert is_test, 'only tests can change the time'
-    _state.time = value
+    _state.clock.set_time(value)
+
+
+def next_deadline() -> Optional[float]:
+    """The earliest point in time at which a sleeping coroutine will wake up (only available in tests)."""
+    assert is_test, 'only tests have a virtual clock'
+    return _state.clock.next_deadline
 
 
 def uptime() -> float:
@@ -104,9 +123,11 @@ def uptime() -> float:
 
 async def sleep(seconds: float) -> None:
     if is_test:
-        sleep_end_time = time() + seconds
-        while time() <= sleep_end_time:
-            await asyncio.sleep(0)
+        # NOTE: wake up every second like below so that stopped automations can finish while sleeping
+        start = time()
+        count = max(int(np.ceil(seconds)), 1)
+        for i in range(1, count + 1):
+            await _state.clock.sleep_until(start + seconds * i / count)
     else:
         if config.simulation_speed <= 0:
             config.simulation_speed = 0.01
@@ -128,13 +149,49 @@ def _run_handler(handler: Callable) -> None:
         log.exception('error while starting handler "%s"', handler.__qualname__)
 
 
+@dataclass(slots=True, kw_only=True)
+class RepeaterStats:
+    calls: int = 0
+    overruns: int = 0  # NOTE handler took longer than the interval
+    skipped: int = 0  # NOTE missed ticks which have been coalesced into a single call
+    total_latency: float = 0.0
+    max_latency: float = 0.0
+    total_duration: float = 0.0
+    max_duration: float = 0.0
+
+    @property
+    def mean_latency(self) -> float:
+        return self.total_latency / self.calls if self.calls else 0.0
+
+    @property
+    def mean_duration(self) -> float:
+        return self.total_duration / self.calls if self.calls else 0.0
+
+
 class Repeater:
     tasks: set[asyncio.Task] = set()
+    instances: weakref.WeakSet[Repeater] = weakref.WeakSet()
+    _phase_slots: dict[float, int] = {}
+    GOLDEN_RATIO = (np.sqrt(5) - 1) / 2
 
     def __init__(self, handler: Callable, interval: float) -> None:
         self.handler = handler
         self.interval = interval
+        self.phase = self._allocate_phase(interval)
+        self.stats = RepeaterStats()
         self._task: asyncio.Task | None = None
+        self.instances.add(self)
+
+    @classmethod
+    def _allocate_phase(cls, interval: float) -> float:
+        """Spread repeaters with the same interval over the interval using a golden ratio sequence.
+
+        The first repeater of each interval starts after one full interval (like before),
+        the following ones are offset so they do not fire at the same time.
+        """
+        slot = cls._phase_slots.get(interval, 0)
+        cls._phase_slots[interval] = slot + 1
+        return interval * (1 - (slot * cls.GOLDEN_RATIO) % 1)
 
     def start(self) -> None:
         if self.running:
@@ -146,7 +203,8 @@ class Repeater:
             startup_handlers.append(self.start)
 
     async def _repeat(self) -> None:
-        await sleep(self.interval)  # NOTE delaying first execution so not all actors rush in at the same time
+        deadline = time() + self.phase
+        await sleep(self.phase)  # NOTE delaying first execution so not all actors rush in at the same time
         while True:
             start = time()
             try:
@@ -167,11 +225,32 @@ class Repeater:
                         f'because it only took {dt*1000:.0f} ms; ' +
                         f'delaying this step for {delay*1000:.0f} ms')
                     await sleep(delay)
+            deadline = self._next_deadline(deadline, start, dt)
             try:
-                await sleep(self.interval - dt)
+                await sleep(deadline - time())
             except (asyncio.CancelledError, GeneratorExit):
                 return
 
+    def _next_deadline(self, deadline: float, start: float, dt: float) -> float:
+        """Update the statistics and compute the next absolute deadline, skipping ticks which have already passed."""
+        latency = max(start - deadline, 0.0)
+        self.stats.calls += 1
+        self.stats.total_latency += latency
+        self.stats.max_latency = max(self.stats.max_latency, latency)
+        self.stats.total_duration += dt
+        self.stats.max_duration = max(self.stats.max_duration, dt)
+        if self.interval <= 0:
+            return start + dt
+        if dt > self.interval:
+            self.stats.overruns += 1
+        deadline += self.interval
+        now = time()
+        if now > deadline:
+            missed = int((now - deadline) // self.interval) + 1
+            self.stats.skipped += missed
+            deadline += missed * self.interval
+        return deadline
+
     def stop(self) -> None:
         if not self._task:
             return
@@ -191,6 +270,12 @@ class Repeater:
         for repeater in Repeater.tasks:
             repeater.cancel()
 
+    @staticmethod
+    def get_stats() -> list[tuple[str, RepeaterStats]]:
+        """Statistics of all repeaters together with the qualified name of their handler, worst latency first."""
+        stats = [(repeater.handler.__qualname__, repeater.stats) for repeater in list(Repeater.instances)]
+        return sorted(stats, key=lambda item: item[1].max_latency, reverse=True)
+
 
 def on_repeat(handler: Callable, interval: float) -> Repeater:
     repeater = Repeater(handler, interval)
@@ -216,7 +301,7 @@ async def startup() -> None:
         raise RuntimeError(
             'multiprocessing start method must be "spawn"; see https://pythonspeed.com/articles/python-multiprocessing/')
 
-    persistence.restore()
+    await persistence.restore()
 
     _state.startup_finished = True
 
@@ -227,23 +312,8 @@ async def startup() -> None:
         await coroutine
 
 
-async def _garbage_collection(mbyte_limit: float = 300) -> None:
-    if psutil.virtual_memory().free < mbyte_limit * 1_000_000:
-        log.warning('less than %s mb of memory remaining -> start garbage collection', mbyte_limit)
-        gc.collect()
-        await sleep(1)  # NOTE ensure all warnings appear before sending "finished" message
-        log.warning('finished garbage collection')
-
-
-async def _watch_emitted_events() -> None:
-    try:
-        for task in event.tasks:
-            if task.done() and task.exception():
-                _state.exception = task.exception()
-                log.exception('task failed to execute', exc_info=task.exception())
-        event.tasks = [t for t in event.tasks if not t.done()]
-    except Exception:
-        log.exception('failed to watch emitted events')
+def _handle_task_exception(exception: BaseException) -> None:
+    _state.exception = exception
 
 
 async def shutdown() -> None:
@@ -273,7 +343,7 @@ async def shutdown() -> None:
 
 def reset_before_test() -> None:
     assert is_test
-    set_time(0)  # NOTE: in tests we start at zero for better readability
+    _state.clock.reset(0)  # NOTE: in tests we start at zero for better readability
     _state.exception = None
 
 
@@ -284,17 +354,18 @@ def reset_after_test() -> None:
     _state.startup_finished = False
     shutdown_handlers.clear()
     event.reset()
+    Repeater._phase_slots.clear()  # pylint: disable=protected-access
 
     register_base_startup_handlers()
 
 
 def register_base_startup_handlers() -> None:
-    on_repeat(_garbage_collection, 60)
-    on_repeat(_watch_emitted_events, 0.1)
+    on_repeat(garbage_collector.step, 0.1)
     on_repeat(persistence.backup, 10)
 
 
-gc.disable()  # NOTE disable automatic garbage collection to optimize performance
+event.task_exception_handlers.append(_handle_task_exception)
+gc.disable()  # NOTE automatic garbage collection is replaced by collecting while the event loop is idle
 register_base_startup_handlers()
 
 app.on_startup(startup)
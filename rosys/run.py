@@ -1,23 +1,34 @@
+from __future__ import annotations
+
 import asyncio
+import heapq
+import itertools
 import logging
 import os
 import shlex
 import signal
 import subprocess
+import time
 import uuid
+from concurrent.futures import Executor as PoolExecutor
+from concurrent.futures import Future
 from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from concurrent.futures.process import BrokenProcessPool
-from contextlib import contextmanager
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass, field
 from functools import partial, wraps
 from pathlib import Path
 from typing import Any, Callable, Generator, Optional
 
+from . import shared_memory
 from .helpers import is_stopping, is_test
 
 process_pool = ProcessPoolExecutor()
+shared_memory_pool = shared_memory.SharedMemoryPool()
 thread_pool = ThreadPoolExecutor(thread_name_prefix='run.py thread_pool')
 running_cpu_bound_processes: list[str] = []  # NOTE is used in tests to advance time slower until computation is done
-running_sh_processes: list[subprocess.Popen] = []
+running_sh_processes: list[asyncio.subprocess.Process] = []
+executors: dict[str, Executor] = {}
 log = logging.getLogger('rosys.run')
 
 
@@ -58,6 +69,47 @@ async def cpu_bound(callback: Callable, *args: Any):
             pass
 
 
+async def cpu_bound_shared(callback: Callable, *args: Any):
+    """like `cpu_bound`, but large `bytes` and `ndarray` arguments and results are transported via shared memory
+
+    Only small handles are pickled and sent through the pipe of the process pool.
+    Large arguments are passed as views into the shared memory; the callback must not keep references to them.
+    """
+    if is_stopping():
+        return
+    payloads = [shared_memory_pool.pack(arg) for arg in args]
+    future: Optional[Future] = None
+    received = False
+    with cpu():
+        try:
+            future = process_pool.submit(shared_memory.call, callback, *payloads)
+            result = await asyncio.wrap_future(future)
+            received = True
+            return shared_memory.receive(result)
+        except BrokenProcessPool:
+            pass
+        except RuntimeError as e:
+            if 'cannot schedule new futures after shutdown' not in str(e):
+                raise
+        except asyncio.exceptions.CancelledError:
+            pass
+        finally:
+            if future is None or future.done():
+                _free_blocks(payloads, None if received else future)
+            else:
+                # NOTE: the worker might still read the arguments and create a result block, so both are freed afterwards
+                future.add_done_callback(partial(_free_blocks, payloads))
+
+
+def _free_blocks(payloads: list[Any], future: Optional[Future]) -> None:
+    """Release the argument blocks of a finished call and destroy the result block if it has not been received."""
+    for payload in payloads:
+        if isinstance(payload, shared_memory.SharedPayload):
+            shared_memory_pool.release(payload.name)
+    if future is not None and not future.cancelled() and future.exception() is None:
+        shared_memory.discard(future.result())
+
+
 @contextmanager
 def cpu() -> Generator[None, None, None]:
     id_ = str(uuid.uuid4())
@@ -68,71 +120,233 @@ def cpu() -> Generator[None, None, None]:
         running_cpu_bound_processes.remove(id_)
 
 
+class QueueFullError(RuntimeError):
+    pass
+
+
+@dataclass(slots=True, kw_only=True)
+class ExecutorStats:
+    submitted: int = 0
+    rejected: int = 0  # NOTE: the queue was full
+    expired: int = 0  # NOTE: the deadline passed before the work started
+    completed: int = 0
+    total_queue_wait: float = 0.0
+    max_queue_wait: float = 0.0
+    total_run_time: float = 0.0
+    max_run_time: float = 0.0
+
+
+@dataclass(slots=True, kw_only=True)
+class _WorkItem:
+    callback: Callable
+    future: asyncio.Future
+    queued: float = field(default_factory=time.perf_counter)
+    timer: Optional[asyncio.TimerHandle] = None
+
+
+class Executor:
+    """A named executor with its own workers and a bounded priority queue.
+
+    Work with a higher priority is started first.
+    Submitting to a full queue raises a `QueueFullError`.
+    Work which has not been started before its timeout is dropped and raises a `TimeoutError`;
+    work which has already been started is not interrupted.
+    """
+
+    def __init__(self, name: str, *, workers: int = 1, max_queue: int = 100, processes: bool = False) -> None:
+        if name in executors:
+            raise ValueError(f'executor "{name}" already exists')
+        self.name = name
+        self.workers = workers
+        self.max_queue = max_queue
+        self.processes = processes
+        self.pool: PoolExecutor = ProcessPoolExecutor(workers) if processes else \
+            ThreadPoolExecutor(workers, thread_name_prefix=f'run.py {name}')
+        self.stats = ExecutorStats()
+        self._queue: list[tuple[int, int, _WorkItem]] = []
+        self._counter = itertools.count()
+        self._running = 0
+        executors[name] = self
+
+    @property
+    def queue_depth(self) -> int:
+        return sum(1 for _, _, item in self._queue if not item.future.done())
+
+    async def submit(self, callback: Callable, *args: Any,
+                     priority: int = 0, timeout: Optional[float] = None, **kwargs: Any) -> Any:
+        if is_stopping():
+            return None
+        if self.queue_depth >= self.max_queue:
+            self.stats.rejected += 1
+            raise QueueFullError(f'queue of executor "{self.name}" is full ({self.max_queue} items)')
+        loop = asyncio.get_running_loop()
+        item = _WorkItem(callback=partial(callback, *args, **kwargs), future=loop.create_future())
+        if timeout is not None:
+            item.timer = loop.call_later(timeout, self._expire, item)
+        heapq.heappush(self._queue, (-priority, next(self._counter), item))
+        self.stats.submitted += 1
+        self._dispatch()
+        with cpu() if self.processes else nullcontext():
+            return await item.future
+
+    def _expire(self, item: _WorkItem) -> None:
+        if not item.future.done():
+            self.stats.expired += 1
+            item.future.set_exception(TimeoutError(f'work was not started by executor "{self.name}" in time'))
+
+    def _dispatch(self) -> None:
+        while self._running < self.workers and self._queue:
+            _, _, item = heapq.heappop(self._queue)
+            if item.future.done():
+                continue  # NOTE: the work has been cancelled or has expired
+            if item.timer:
+                item.timer.cancel()
+            queue_wait = time.perf_counter() - item.queued
+            self.stats.total_queue_wait += queue_wait
+            self.stats.max_queue_wait = max(self.stats.max_queue_wait, queue_wait)
+            try:
+                future = asyncio.get_running_loop().run_in_executor(self.pool, _timed, item.callback)
+            except RuntimeError as e:
+                item.future.set_exception(e)
+                continue
+            self._running += 1
+            future.add_done_callback(partial(self._finish, item))
+
+    def _finish(self, item: _WorkItem, future: asyncio.Future) -> None:
+        self._running -= 1
+        if future.cancelled():
+            item.future.cancel()
+        elif future.exception() is not None:
+            if not item.future.done():
+                item.future.set_exception(future.exception())  # type: ignore
+        else:
+            result, run_time = future.result()
+            self.stats.completed += 1
+            self.stats.total_run_time += run_time
+            self.stats.max_run_time = max(self.stats.max_run_time, run_time)
+            if not item.future.done():
+                item.future.set_result(result)
+        self._dispatch()
+
+    def shutdown(self) -> None:
+        """Cancel all queued work and unregister the executor so that its name can be used again."""
+        for _, _, item in self._queue:
+            item.future.cancel()
+        self._queue.clear()
+        self.pool.shutdown(wait=False, cancel_futures=True)
+        if executors.get(self.name) is self:
+            del executors[self.name]
+
+
+def _timed(callback: Callable) -> tuple[Any, float]:
+    start = time.perf_counter()
+    result = callback()
+    return result, time.perf_counter() - start
+
+
+def get_executor(name: str) -> Executor:
+    return executors[name]
+
+
 async def sh(command: list[str] | str, *,
              timeout: Optional[float] = 1,
              shell: bool = False,
-             working_dir: Optional[Path] = None) -> str:
+             working_dir: Optional[Path] = None,
+             on_output: Optional[Callable[[str], Any]] = None) -> str:
     """executes a shell command
 
+    The command runs as an asyncio subprocess, so no worker of the thread pool is blocked while waiting for it.
+    If the calling task is cancelled or the timeout is reached, the whole process group is terminated.
+
     Args:
         command: a sequence of program arguments as subprocess.Popen requires or full string
+        timeout: maximum runtime in seconds (default is 1, `None` for no limit)
         shell: whether a subshell should be launched (default is `False`, for speed, use `True` if you need file globbing or other features)
+        working_dir: working directory of the process
+        on_output: optional callback which is called with each line of stdout and stderr as soon as it is available
 
     Returns:
-        stdout
+        stdout (or stderr if the command failed)
     """
-    def popen() -> str:
-        cmd_list = command if isinstance(command, list) else shlex.split(command)
-        if timeout is not None:
-            cmd_list = ['timeout', '--signal=SIGTERM', str(timeout)] + cmd_list
-        cmd = ' '.join(cmd_list) if shell else cmd_list
-        try:
-            with subprocess.Popen(
-                cmd,
+    if is_stopping():
+        return ''
+    try:
+        if shell:
+            proc = await asyncio.create_subprocess_shell(
+                command if isinstance(command, str) else ' '.join(command),
                 cwd=working_dir,
                 stdout=subprocess.PIPE,
                 stderr=subprocess.PIPE,
-                shell=shell,
                 start_new_session=True,
-            ) as proc:
-                running_sh_processes.append(proc)
-                stdout, stderr = proc.communicate()
-                assert proc.stdout is not None
-                assert proc.stderr is not None
-                proc.stdout.close()
-                proc.stderr.close()
-                _kill(proc)
-                running_sh_processes.remove(proc)
-                return stdout.decode('utf-8') if proc.returncode == 0 else stderr.decode('utf-8')
-        except Exception:
-            log.exception('failed to run command "%s"', cmd)
-            if 'proc' in locals() and proc:
-                _kill(proc)
-            return ''
-
-    if is_stopping():
+            )
+        else:
+            proc = await asyncio.create_subprocess_exec(
+                *(command if isinstance(command, list) else shlex.split(command)),
+                cwd=working_dir,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                start_new_session=True,
+            )
+    except Exception:
+        log.exception('failed to run command "%s"', command)
         return ''
+    running_sh_processes.append(proc)
     try:
-        return await asyncio.wait_for(io_bound(popen), timeout) or ''
+        stdout, stderr = await asyncio.wait_for(_communicate(proc, on_output), timeout)
+        return stdout if proc.returncode == 0 else stderr
     except asyncio.TimeoutError:
         log.warning('Command "%s" timed out after %s seconds.', command, timeout)
         return ''
+    except Exception:
+        log.exception('failed to run command "%s"', command)
+        return ''
+    finally:
+        if proc.returncode is None:
+            await _terminate(proc)
+        if proc in running_sh_processes:
+            running_sh_processes.remove(proc)
+
 
+async def _communicate(proc: asyncio.subprocess.Process, on_output: Optional[Callable[[str], Any]]) -> tuple[str, str]:
+    assert proc.stdout is not None
+    assert proc.stderr is not None
+    stdout, stderr = await asyncio.gather(_read_lines(proc.stdout, on_output), _read_lines(proc.stderr, on_output))
+    await proc.wait()
+    return stdout, stderr
 
-def _kill(proc: subprocess.Popen) -> None:
+
+async def _read_lines(stream: asyncio.StreamReader, on_output: Optional[Callable[[str], Any]]) -> str:
+    # NOTE: reading chunks instead of using readline() which fails for lines longer than the stream limit (64 KiB)
+    chunks: list[bytes] = []
+    pending = b''
+    while chunk := await stream.read(2**16):
+        chunks.append(chunk)
+        if on_output:
+            *lines, pending = (pending + chunk).split(b'\n')
+            for line in lines:
+                on_output(line.decode('utf-8', errors='replace') + '\n')
+    if on_output and pending:
+        on_output(pending.decode('utf-8', errors='replace'))
+    return b''.join(chunks).decode('utf-8', errors='replace')
+
+
+async def _terminate(proc: asyncio.subprocess.Process) -> None:
+    _kill(proc)
     try:
-        os.killpg(os.getpgid(proc.pid), signal.SIGTERM)
-        log.info('sent SIGTERM to %s', proc.pid)
-        try:
-            proc.wait(timeout=5)  # wait for 5 seconds
-        except subprocess.TimeoutExpired:
-            os.killpg(os.getpgid(proc.pid), signal.SIGKILL)  # force kill if process didn't terminate
-            log.info('sent SIGKILL to %s', proc.pid)
-            proc.wait()  # ensure the process is reaped
+        await asyncio.wait_for(proc.wait(), 5)
+    except asyncio.TimeoutError:
+        _kill(proc, signal.SIGKILL)  # force kill if process didn't terminate
+        await proc.wait()  # ensure the process is reaped
+
+
+def _kill(proc: asyncio.subprocess.Process, sig: signal.Signals = signal.SIGTERM) -> None:
+    try:
+        os.killpg(os.getpgid(proc.pid), sig)
+        log.info('sent %s to %s', sig.name, proc.pid)
     except ProcessLookupError:
         pass
     except Exception:
-        log.exception('Failed to kill and/or wait for process %s', proc.pid)
+        log.exception('Failed to kill process %s', proc.pid)
 
 
 def tear_down() -> None:
@@ -147,4 +361,8 @@ def tear_down() -> None:
         for process_ in process_pool._processes.values():  # pylint: disable=protected-access
             process_.kill()
         process_pool.shutdown(wait=True, cancel_futures=True)
+        for executor in list(executors.values()):
+            log.info('teardown executor %s...', executor.name)
+            executor.shutdown()
+    shared_memory_pool.clear()
     log.info('teardown complete.')
@@ -0,0 +1,167 @@
+import logging
+import threading
+from collections import defaultdict
+from dataclasses import dataclass
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Callable, Optional
+
+import numpy as np
+
+MIN_PAYLOAD_SIZE = 64 * 1024
+"""payloads smaller than this are pickled as usual"""
+
+MIN_BLOCK_SIZE = 64 * 1024
+
+log = logging.getLogger('rosys.shared_memory')
+
+
+@dataclass(slots=True, kw_only=True, frozen=True)
+class SharedPayload:
+    """Handle of a `bytes` or `ndarray` payload which has been copied into a shared memory block."""
+    name: str
+    nbytes: int
+    shape: Optional[tuple[int, ...]] = None  # NOTE: None for bytes
+    dtype: str = 'uint8'
+
+
+class SharedMemoryPool:
+    """Pool of reusable shared memory blocks.
+
+    Blocks are grouped into power-of-two size classes so that payloads of similar size (like camera frames) reuse the same blocks.
+    """
+
+    def __init__(self, max_free_blocks: int = 4) -> None:
+        self.max_free_blocks = max_free_blocks
+        self._free: dict[int, list[SharedMemory]] = defaultdict(list)
+        self._in_use: dict[str, SharedMemory] = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, nbytes: int) -> SharedMemory:
+        capacity = max(MIN_BLOCK_SIZE, 1 << (nbytes - 1).bit_length())
+        with self._lock:
+            block = self._free[capacity].pop() if self._free[capacity] else SharedMemory(create=True, size=capacity)
+            self._in_use[block.name] = block
+        return block
+
+    def release(self, name: str, *, reuse: bool = True) -> None:
+        with self._lock:
+            block = self._in_use.pop(name, None)
+            if block is None:
+                return  # NOTE: the pool has been cleared while the block was in use
+            free_blocks = self._free[block.size]
+            if reuse and len(free_blocks) < self.max_free_blocks:
+                free_blocks.append(block)
+                return
+        _destroy(block)
+
+    def pack(self, value: Any) -> Any:
+        """Copy large `bytes` and `ndarray` values into a block of the pool and return a handle instead."""
+        if isinstance(value, (bytes, bytearray)) and len(value) >= MIN_PAYLOAD_SIZE:
+            block = self.acquire(len(value))
+            _buffer(block)[:len(value)] = value
+            return SharedPayload(name=block.name, nbytes=len(value))
+        if isinstance(value, np.ndarray) and value.nbytes >= MIN_PAYLOAD_SIZE and value.dtype != object:
+            block = self.acquire(value.nbytes)
+            np.ndarray(value.shape, dtype=value.dtype, buffer=_buffer(block))[...] = value
+            return SharedPayload(name=block.name, nbytes=value.nbytes, shape=value.shape, dtype=value.dtype.str)
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            blocks = [block for free_blocks in self._free.values() for block in free_blocks]
+            blocks += self._in_use.values()
+            self._free.clear()
+            self._in_use.clear()
+        for block in blocks:
+            _destroy(block)
+
+
+def _destroy(block: SharedMemory) -> None:
+    try:
+        block.close()
+        block.unlink()
+    except Exception:
+        log.exception('could not destroy shared memory block %s', block.name)
+
+
+def _buffer(block: SharedMemory) -> memoryview:
+    assert block.buf is not None, f'shared memory block {block.name} has been closed'
+    return block.buf
+
+
+def _view(block: SharedMemory, payload: SharedPayload) -> Any:
+    if payload.shape is None:
+        return _buffer(block)[:payload.nbytes].toreadonly()
+    return np.ndarray(payload.shape, dtype=np.dtype(payload.dtype), buffer=_buffer(block))
+
+
+def _export(value: Any) -> Any:
+    """Copy a large result into a new shared memory block (runs in the worker process)."""
+    if isinstance(value, (bytes, bytearray, memoryview)) and memoryview(value).nbytes >= MIN_PAYLOAD_SIZE:
+        data = memoryview(value).cast('B')
+        block = SharedMemory(create=True, size=data.nbytes)
+        _buffer(block)[:data.nbytes] = data
+        payload = SharedPayload(name=block.name, nbytes=data.nbytes)
+    elif isinstance(value, np.ndarray) and value.nbytes >= MIN_PAYLOAD_SIZE and value.dtype != object:
+        block = SharedMemory(create=True, size=value.nbytes)
+        np.ndarray(value.shape, dtype=value.dtype, buffer=_buffer(block))[...] = value
+        payload = SharedPayload(name=block.name, nbytes=value.nbytes, shape=value.shape, dtype=value.dtype.str)
+    elif isinstance(value, np.ndarray):
+        return value.copy()  # NOTE: the value might be a view into a block which is about to be closed
+    elif isinstance(value, memoryview):
+        return value.tobytes()
+    else:
+        return value
+    block.close()  # NOTE: the block is unlinked by the receiving process
+    return payload
+
+
+def call(callback: Callable, *args: Any) -> Any:
+    """Call the callback with shared payloads being replaced by their content (runs in the worker process).
+
+    Arrays and bytes are passed as views (`ndarray` and read-only `memoryview`) into the shared memory block
+    without copying them; the callback must not keep references to them.
+    """
+    blocks: list[SharedMemory] = []
+    values = []
+    for arg in args:
+        if isinstance(arg, SharedPayload):
+            block = SharedMemory(name=arg.name)
+            blocks.append(block)
+            values.append(_view(block, arg))
+        else:
+            values.append(arg)
+    try:
+        return _export(callback(*values))
+    finally:
+        del values
+        for block in blocks:
+            try:
+                block.close()
+            except BufferError:
+                log.warning('callback kept a reference to shared memory block %s', block.name)
+
+
+def receive(value: Any) -> Any:
+    """Copy a result out of its shared memory block and free the block (runs in the main process)."""
+    if not isinstance(value, SharedPayload):
+        return value
+    block = SharedMemory(name=value.name)
+    try:
+        if value.shape is None:
+            return bytes(_buffer(block)[:value.nbytes])
+        return np.array(_view(block, value))
+    finally:
+        block.close()
+        block.unlink()
+
+
+def discard(value: Any) -> None:
+    """Free the shared memory block of a result which will not be received (runs in the main process)."""
+    if not isinstance(value, SharedPayload):
+        return
+    try:
+        block = SharedMemory(name=value.name)
+    except FileNotFoundError:
+        return
+    _destroy(block)
@@ -27,12 +27,17 @@ async def forward(seconds: Optional[float] = None,
                   dt: float = 0.01,
                   timeout: float = 100):
     start_time = rosys.time()
+    target_time: Optional[float] = None
     if seconds is not None:
+        target_time = start_time + seconds
+
         def condition():
             return rosys.time() >= start_time + seconds
         msg = f'forwarding {seconds=}'
         timeout = max(timeout, seconds)
     elif isinstance(until, (int, float)):
+        target_time = until
+
         def condition():
             return rosys.time() >= until
         msg = f'forwarding {until=}'
@@ -63,7 +68,8 @@ async def forward(seconds: Optional[float] = None,
         if rosys.time() > start_time + timeout:
             raise TimeoutError(f'condition took more than {timeout} s')
         if not run.running_cpu_bound_processes:
-            rosys.set_time(rosys.time() + dt)
+            await asyncio.sleep(0)  # NOTE: let new tasks register their deadlines before jumping ahead
+            rosys.set_time(_next_time(dt, target_time, start_time + timeout + dt))
             await asyncio.sleep(0)
         else:
             await asyncio.sleep(0.01)
@@ -72,6 +78,19 @@ async def forward(seconds: Optional[float] = None,
             raise RuntimeError(f'error while forwarding time {dt} s') from exception
 
 
+def _next_time(dt: float, target_time: Optional[float], limit: float) -> float:
+    """Jump directly to the next deadline of a sleeping coroutine without passing the target time.
+
+    If no coroutine is sleeping, the time is advanced by `dt`.
+    """
+    next_time = rosys.next_deadline()
+    if next_time is None:
+        next_time = rosys.time() + dt
+    if target_time is not None:
+        next_time = min(next_time, target_time)
+    return min(next_time, limit)
+
+
 def assert_pose(x: float, y: float, *, deg: Optional[float] = None, position_tolerance: float = 0.1, deg_tolerance: float = 1.0) -> None:
     assert odometer is not None
     assert odometer.prediction.x == pytest.approx(x, abs=position_tolerance)
@@ -0,0 +1,47 @@
+import asyncio
+import heapq
+import itertools
+from typing import Optional
+
+
+class VirtualClock:
+    """Discrete-event clock used in tests and accelerated simulations.
+
+    Sleeping coroutines register their deadline in a heap and are woken up as soon as the clock passes it.
+    This way the time can jump directly to the next pending deadline instead of advancing in small fixed steps.
+    """
+
+    def __init__(self, start_time: float = 0.0) -> None:
+        self.time = start_time
+        self._sleepers: list[tuple[float, int, asyncio.Future]] = []
+        self._counter = itertools.count()
+
+    @property
+    def next_deadline(self) -> Optional[float]:
+        """The earliest deadline of all sleeping coroutines (or `None` if no coroutine is sleeping)."""
+        while self._sleepers and self._sleepers[0][2].done():
+            heapq.heappop(self._sleepers)  # NOTE the sleeping task has been cancelled
+        return self._sleepers[0][0] if self._sleepers else None
+
+    async def sleep_until(self, deadline: float) -> None:
+        if deadline <= self.time:
+            await asyncio.sleep(0)
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._sleepers, (deadline, next(self._counter), future))
+        await future
+
+    def set_time(self, value: float) -> None:
+        """Set the current time and wake up all coroutines with a deadline up to this point in time."""
+        self.time = value
+        while self._sleepers and self._sleepers[0][0] <= value:
+            _, _, future = heapq.heappop(self._sleepers)
+            if not future.done():
+                future.set_result(None)
+
+    def reset(self, start_time: float = 0.0) -> None:
+        for _, _, future in self._sleepers:
+            if not future.done() and not future.get_loop().is_closed():
+                future.cancel()
+        self._sleepers.clear()
+        self.time = start_time
@@ -6,7 +6,7 @@ import socketio
 import socketio.exceptions
 
 from .. import persistence, rosys
-from ..helpers import LazyWorker
+from ..helpers import LazyWorkerPool
 from .detections import BoxDetection, Detections, PointDetection, SegmentationDetection
 from .detector import Autoupload, Detector
 from .image import Image
@@ -16,13 +16,15 @@ class DetectorHardware(Detector):
     """This detector communicates with a [YOLO detector](https://hub.docker.com/r/zauberzeug/yolov5-detector) via Socket.IO.
 
     It automatically connects and reconnects, submits and receives detections and sends images that should be uploaded to the [Zauberzeug Learning Loop](https://zauberzeug.com/products/learning-loop).
+    Up to `parallel_detections` images are detected at the same time;
+    for each camera only the latest image waits for detection while older ones are skipped.
     """
 
-    def __init__(self, *, port: int = 8004, name: Optional[str] = None) -> None:
+    def __init__(self, *, port: int = 8004, name: Optional[str] = None, parallel_detections: int = 1) -> None:
         super().__init__(name=name)
 
         self.sio = socketio.AsyncClient()
-        self.lazy_worker = LazyWorker()
+        self.lazy_worker = LazyWorkerPool(parallel_detections)
         self.port = port
         self.timeout_count = 0
 
@@ -105,7 +107,7 @@ class DetectorHardware(Detector):
                      autoupload: Autoupload = Autoupload.FILTERED,
                      tags: list[str] = [],
                      ) -> Detections | None:
-        return await self.lazy_worker.run(self._detect(image, autoupload, tags))
+        return await self.lazy_worker.run(self._detect(image, autoupload, tags), key=image.camera_id)
 
     async def _detect(self, image: Image, autoupload: Autoupload, tags: list[str]) -> Detections | None:
         if image.is_broken:
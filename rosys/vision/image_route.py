@@ -64,7 +64,7 @@ async def _try_get_jpeg(camera: Camera, timestamp: str, *, shrink: int, undistor
                 return image.data
             else:
                 calibration = camera.calibration if undistort else None  # type: ignore
-                return await run.cpu_bound(_process, image.data, calibration, shrink, undistort)
+                return await run.cpu_bound_shared(_process, image.data, calibration, shrink, undistort)
     return None
 
 
@@ -95,7 +95,7 @@ class MjpegCamera(TransformableCamera, ConfigurableCamera):
             return
 
         if self.crop or self.rotation != ImageRotation.NONE:
-            image = await rosys.run.cpu_bound(process_jpeg_image, image, self.rotation, self.crop)
+            image = await rosys.run.cpu_bound_shared(process_jpeg_image, image, self.rotation, self.crop)
         if image is None:
             return
         try:
@@ -95,7 +95,7 @@ class RtspCamera(ConfigurableCamera, TransformableCamera):
 
         if not image_bytes:
             return
-        transformed_image_bytes = await rosys.run.cpu_bound(process_jpeg_image, image_bytes, self.rotation, self.crop)
+        transformed_image_bytes = await rosys.run.cpu_bound_shared(process_jpeg_image, image_bytes, self.rotation, self.crop)
         if transformed_image_bytes is None:
             return
 
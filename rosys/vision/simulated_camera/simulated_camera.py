@@ -70,7 +70,7 @@ class SimulatedCamera(ConfigurableCamera, TransformableCamera):
             image.data = b'test data'
         else:
             assert self.device is not None
-            image.data = await rosys.run.cpu_bound(self.device.create_image_data)
+            image.data = await rosys.run.cpu_bound_shared(self.device.create_image_data)
         self._add_image(image)
 
     def _set_color(self, value: str) -> None:
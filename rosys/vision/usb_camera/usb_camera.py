@@ -105,9 +105,9 @@ class UsbCamera(ConfigurableCamera, TransformableCamera):
         if image_is_MJPG:
             bytes_ = await rosys.run.io_bound(to_bytes, captured_image)
             if self.crop or self.rotation != ImageRotation.NONE:
-                bytes_ = await rosys.run.cpu_bound(process_jpeg_image, bytes_, self.rotation, self.crop)
+                bytes_ = await rosys.run.cpu_bound_shared(process_jpeg_image, bytes_, self.rotation, self.crop)
         else:
-            bytes_ = await rosys.run.cpu_bound(process_ndarray_image, captured_image, self.rotation, self.crop)
+            bytes_ = await rosys.run.cpu_bound_shared(process_ndarray_image, captured_image, self.rotation, self.crop)
         if bytes_ is None:
             return
 
@@ -68,3 +68,95 @@ async def test_fire_and_forget_with_emit():
         await forward(1.0)
     assert ex_info.value.__cause__ is not None
     assert 'some failure' in str(ex_info.value.__cause__)
+
+
+@pytest.mark.usefixtures('integration')
+async def test_latest_delivery_drops_stale_values():
+    async def slow_handler(number: int) -> None:
+        numbers.append(number)
+        await rosys.sleep(1)
+
+    numbers = []
+    TEST_EVENT.register(slow_handler, delivery='latest')
+    TEST_EVENT.emit(0)
+    await forward(0.5)
+    for i in range(1, 5):
+        TEST_EVENT.emit(i)
+    assert numbers == [0]
+    await forward(2.0)
+    assert numbers == [0, 4]
+    assert TEST_EVENT.listeners[-1].dropped == 3
+
+
+@pytest.mark.usefixtures('integration')
+async def test_batch_delivery():
+    async def slow_handler(batch: list[int]) -> None:
+        batches.append(batch)
+        await rosys.sleep(1)
+
+    batches = []
+    TEST_EVENT.register(slow_handler, delivery='batch', maxlen=3)
+    TEST_EVENT.emit(0)
+    await forward(0.5)
+    for i in range(1, 6):
+        TEST_EVENT.emit(i)
+    await forward(2.0)
+    assert batches == [[0], [3, 4, 5]]
+
+
+@pytest.mark.usefixtures('integration')
+async def test_queue_delivery_continues_after_exception():
+    async def failing_handler(number: int) -> None:
+        numbers.append(number)
+        if number == 1:
+            raise Exception('some failure')
+
+    numbers = []
+    TEST_EVENT.register(failing_handler, delivery='queue')
+    for i in range(4):
+        TEST_EVENT.emit(i)
+    with pytest.raises(RuntimeError):
+        await forward(1.0)
+    assert numbers == [0, 1, 2, 3], 'the remaining calls should still be delivered'
+    assert not TEST_EVENT.listeners[-1].busy
+
+
+@pytest.mark.usefixtures('integration')
+async def test_instrumentation():
+    async def failing_handler(_: int) -> None:
+        await rosys.sleep(0.5)
+        raise Exception('some failure')
+
+    event = Event()
+    event.register(lambda _: None)
+    event.register(failing_handler)
+    rosys.event.instrumented = True
+    try:
+        event.emit(1)
+        event.emit(2)
+        with pytest.raises(RuntimeError):
+            await forward(1.0)
+    finally:
+        rosys.event.instrumented = False
+    assert event.emits == 2
+    assert [l.stats.calls for l in event.listeners] == [2, 2]
+    assert [l.stats.exceptions for l in event.listeners] == [0, 2]
+    assert sum(event.listeners[1].stats.histogram) == 2
+
+
+@pytest.mark.usefixtures('integration')
+async def test_finished_tasks_are_reported_and_removed(monkeypatch: pytest.MonkeyPatch) -> None:
+    async def failing_handler(number: int) -> None:
+        await rosys.sleep(0.5)
+        if number == 1:
+            raise Exception('some failure')
+
+    exceptions: list[BaseException] = []
+    monkeypatch.setattr(rosys.event, 'task_exception_handlers', [exceptions.append])
+    TEST_EVENT.register(failing_handler)
+    TEST_EVENT.emit(0)
+    TEST_EVENT.emit(1)
+    assert len(rosys.event.tasks) == 2
+    await forward(0.6)
+    assert [str(e) for e in exceptions] == ['some failure'], 'the failure should be reported as soon as the task is done'
+    assert not rosys.event.tasks, 'failed and successful tasks should be removed'
@@ -0,0 +1,111 @@
+from types import SimpleNamespace
+
+import pytest
+
+from rosys import garbage_collection
+from rosys.garbage_collection import GarbageCollector
+
+
+class FakeGc:
+
+    def __init__(self) -> None:
+        self.count = (0, 0, 0)
+        self.collected: list[int] = []
+
+    def get_count(self) -> tuple[int, int, int]:
+        return self.count
+
+    def get_threshold(self) -> tuple[int, int, int]:
+        return (700, 10, 10)
+
+    def collect(self, generation: int) -> None:
+        self.collected.append(generation)
+
+
+class FakePsutil:
+
+    def __init__(self) -> None:
+        self.available = 1_000_000_000
+        self.rss = 100_000_000
+
+    def virtual_memory(self) -> SimpleNamespace:
+        return SimpleNamespace(available=self.available)
+
+    def Process(self) -> SimpleNamespace:  # pylint: disable=invalid-name
+        return SimpleNamespace(memory_info=lambda: SimpleNamespace(rss=self.rss))
+
+
+@pytest.fixture
+def fake_gc(monkeypatch: pytest.MonkeyPatch) -> FakeGc:
+    fake = FakeGc()
+    monkeypatch.setattr(garbage_collection, 'gc', fake)
+    return fake
+
+
+@pytest.fixture
+def fake_psutil(monkeypatch: pytest.MonkeyPatch) -> FakePsutil:
+    fake = FakePsutil()
+    monkeypatch.setattr(garbage_collection, 'psutil', fake)
+    return fake
+
+
+def create_collector(lag: float, **kwargs) -> GarbageCollector:
+    collector = GarbageCollector(memory_check_interval=0, **kwargs)
+    set_lag(collector, lag)
+    return collector
+
+
+def set_lag(collector: GarbageCollector, lag: float) -> None:
+    async def measure_lag() -> float:
+        return lag
+    collector._measure_lag = measure_lag  # type: ignore # pylint: disable=protected-access
+
+
+async def test_collecting_only_while_idle(fake_gc: FakeGc, fake_psutil: FakePsutil):
+    fake_gc.count = (800, 0, 0)
+    busy = create_collector(lag=0.01, max_delay=1000)
+    await busy.step()
+    assert fake_gc.collected == []
+    assert busy.skipped_busy == 1
+
+    idle = create_collector(lag=0.0)
+    await idle.step()
+    assert fake_gc.collected == [0]
+    fake_gc.count = (2000, 10, 0)
+    await idle.step()
+    assert fake_gc.collected == [0, 1], 'the middle generation should be collected once its threshold is reached'
+
+
+async def test_threshold_adaption(fake_gc: FakeGc, fake_psutil: FakePsutil):
+    collector = create_collector(lag=0.0, pause_budget=0.005)
+    collector._adapt_threshold(0.01)  # pylint: disable=protected-access
+    assert collector._threshold0 == 350, 'long pauses should halve the threshold'  # pylint: disable=protected-access
+    for _ in range(10):
+        collector._adapt_threshold(0.0001)  # pylint: disable=protected-access
+    assert collector._threshold0 == 700 * 16, 'short pauses should double the threshold up to a limit'  # pylint: disable=protected-access
+
+
+async def test_full_collection(fake_gc: FakeGc, fake_psutil: FakePsutil):
+    collector = create_collector(lag=0.01, max_delay=1000)
+    await collector.step()
+    fake_psutil.rss += 300_000_000
+    await collector.step()
+    assert fake_gc.collected == [], 'a grown process should wait for the loop to be idle'
+    set_lag(collector, 0.0)
+    await collector.step()
+    assert fake_gc.collected == [2]
+
+    fake_psutil.available = 100_000_000
+    set_lag(collector, 0.01)
+    await collector.step()
+    assert fake_gc.collected == [2, 2], 'low memory should be collected even if the loop is busy'
+    assert collector.stats[2].count == 2
+
+
+async def test_maximum_delay(fake_gc: FakeGc, fake_psutil: FakePsutil):
+    fake_gc.count = (800, 0, 0)
+    collector = create_collector(lag=0.01, max_delay=0.0)
+    await collector.step()
+    assert fake_gc.collected == []
+    await collector.step()
+    assert fake_gc.collected == [0], 'a deferred collection should be done after the maximum delay'
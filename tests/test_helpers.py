@@ -1,3 +1,7 @@
+import asyncio
+
+import pytest
+
 from rosys import helpers
 
 
@@ -49,3 +53,22 @@ def test_ramp():
     assert helpers.ramp(5, 8, 2, 80, 20, clip=True) == 50
     assert helpers.ramp(8, 8, 2, 80, 20, clip=True) == 80
     assert helpers.ramp(9, 8, 2, 80, 20, clip=True) == 80
+
+
+async def test_lazy_worker_pool():
+    async def detect(name: str) -> str:
+        await asyncio.sleep(0.01)
+        return name
+
+    pool = helpers.LazyWorkerPool(2)
+    results = await asyncio.gather(*(pool.run(detect(f'{camera}{i}'), key=camera) for i in range(3) for camera in 'abc'))
+    assert results == ['a0', 'b0', None, None, None, None, 'a2', 'b2', 'c2'], 'only the latest request per key waits'
+    assert pool.stats == helpers.LazyWorkerStats(completed=5, replaced=4, dropped=0)
+
+    async def fail() -> None:
+        raise RuntimeError('detection failed')
+
+    with pytest.raises(RuntimeError):
+        await pool.run(fail(), key='a')
+    assert pool.stats.completed == 5, 'failed coroutines should not be counted as completed'
+    assert pool.stats.failed == 1
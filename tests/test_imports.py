@@ -0,0 +1,20 @@
+import subprocess
+import sys
+
+LAZY_MODULES = ['analysis', 'automation', 'driving', 'geometry', 'hardware', 'pathplanning', 'system', 'vision',
+                'simulation_ui']
+
+SCRIPT = f'''
+import sys
+import rosys
+print([name for name in {[f'rosys.{name}' for name in LAZY_MODULES]!r} if name in sys.modules])
+rosys.vision
+print('rosys.vision' in sys.modules)
+'''
+
+
+def test_lazy_subpackages() -> None:
+    result = subprocess.run([sys.executable, '-c', SCRIPT], capture_output=True, text=True, check=True, timeout=60)
+    loaded, vision_loaded = result.stdout.splitlines()
+    assert loaded == '[]', 'importing rosys should not import the lazy subpackages'
+    assert vision_loaded == 'True', 'accessing a lazy subpackage should import it'
@@ -0,0 +1,28 @@
+import asyncio
+import threading
+import time
+
+from rosys.analysis import LoopMonitor
+
+
+async def test_loop_monitor_captures_blocking_stack(integration: None):
+    monitor = LoopMonitor(threshold=0.05)
+    monitor.start()
+    await asyncio.sleep(0.05)
+    time.sleep(0.2)  # NOTE: block the event loop
+    await asyncio.sleep(0.05)
+    monitor.stop()
+    assert monitor.max_lag >= 0.15
+    assert len(monitor.stalls) == 1
+    assert 'test_loop_monitor_captures_blocking_stack' in ''.join(monitor.stalls[0].stack)
+
+
+async def test_loop_monitor_restart(integration: None):
+    monitor = LoopMonitor()
+    monitor.start()
+    monitor.stop()
+    monitor.start()
+    await asyncio.sleep(0.05)
+    monitor.stop()
+    assert [t.name for t in threading.enumerate()].count('rosys loop monitor') <= 1, 'old watchers should have been joined'
+    assert monitor.lags, 'the restarted probe should measure the loop lag'
@@ -1,6 +1,7 @@
 import asyncio
 import time
 import uuid
+from pathlib import Path
 
 import numpy as np
 import pytest
@@ -11,6 +12,9 @@ from rosys.geometry import Point, Pose, Prism, Spline
 from rosys.hardware import Robot
 from rosys.pathplanning import Obstacle, PathPlanner
 from rosys.pathplanning.delaunay_planner import DelaunayPlanner
+from rosys.pathplanning.grid import Grid
+from rosys.pathplanning.obstacle_map import ObstacleMap
+from rosys.pathplanning.planner_process import PlannerWorldUpdate
 from rosys.testing import assert_point, forward
 
 
@@ -68,18 +72,43 @@ async def test_test_spline(path_planner: PathPlanner) -> None:
     assert await path_planner.test_spline(spline) == True
 
 
+async def test_world_sync(path_planner: PathPlanner) -> None:
+    await forward(1.0)
+    spline = Spline.from_poses(Pose(x=0, y=0), Pose(x=2, y=1))
+    assert await path_planner.test_spline(spline) == False
+    version = path_planner.world_version
+    assert await path_planner.test_spline(spline) == False
+    assert path_planner.world_version == version, 'an unchanged world should not be sent again'
+
+    obstacle = create_obstacle(x=5, y=5)
+    path_planner.obstacles[obstacle.id] = obstacle
+    assert await path_planner.test_spline(spline) == False
+    obstacle.outline[:] = create_obstacle(x=2, y=1).outline
+    path_planner.OBSTACLES_CHANGED.emit(path_planner.obstacles)
+    assert await path_planner.test_spline(spline) == True, 'announced changes in place should be sent'
+    del path_planner.obstacles[obstacle.id]
+    assert await path_planner.test_spline(spline) == False
+    assert path_planner.world_version == version + 3
+
+    path_planner.connection.send(PlannerWorldUpdate(version=-1))  # NOTE: bring the planner process out of sync
+    assert await path_planner.test_spline(spline) == False, 'the world should be resent once the process is out of sync'
+    assert path_planner.world_version == version + 4
+
+
 def test_grow_map(shape: Prism) -> None:
     planner = DelaunayPlanner(shape.outline)
     assert planner.obstacle_map is None
 
     start = Pose(x=0, y=0)
     goal = Pose(x=2, y=1)
-    planner.update_map([], [], [start, goal], time.time() + 3.0)
+    planner.update_map([], [], [start.point, goal.point], time.time() + 3.0)
     path = planner.search(start, goal)
     assert path is not None
+    assert planner.obstacle_map is not None
     assert planner.obstacle_map.grid.bbox == pytest.approx((-1.2, -1.2, 4.4, 3.4))
 
     planner.grow_map([Point(x=5, y=0)], time.time() + 3.0)
+    assert planner.obstacle_map is not None
     assert planner.obstacle_map.grid.bbox == pytest.approx((-2.4, -2.4, 8.6, 5.8))
 
 
@@ -96,3 +125,89 @@ async def test_overlapping_commands(path_planner: PathPlanner) -> None:
     path, test = await asyncio.gather(task1, task2)
     assert isinstance(path, list)
     assert isinstance(test, bool)
+
+
+def test_incremental_map_update(shape: Prism) -> None:
+    planner = DelaunayPlanner(shape.outline)
+    corners = [Point(x=0, y=0), Point(x=8, y=6)]
+    obstacle = create_obstacle(x=6, y=4, radius=0.3)
+    planner.update_map([], [obstacle], corners, time.time() + 10.0)
+    assert planner.obstacle_map is not None
+    grid = planner.obstacle_map.grid
+
+    new_obstacle = create_obstacle(x=2.05, y=2.15, radius=0.3)
+    planner.update_map([], [obstacle, new_obstacle], corners, time.time() + 10.0)
+    assert planner.obstacle_map is not None
+    assert planner.obstacle_map.grid is grid, 'the map should be updated instead of recreated'
+
+    expected = ObstacleMap.from_world(shape.outline, [], [obstacle, new_obstacle], grid)
+    assert planner.obstacle_map.stack is not None and expected.stack is not None
+    assert planner.obstacle_map.dist_stack is not None and expected.dist_stack is not None
+    assert np.array_equal(planner.obstacle_map.map, expected.map)
+    assert np.array_equal(planner.obstacle_map.stack, expected.stack)
+    assert np.allclose(planner.obstacle_map.dist_stack, expected.dist_stack)
+
+    spline = Spline.from_poses(Pose(x=1, y=2.15), Pose(x=3, y=2.15))
+    assert planner.obstacle_map.test_spline(spline)
+    planner.update_map([], [obstacle], corners, time.time() + 10.0)
+    assert planner.obstacle_map is not None
+    assert not planner.obstacle_map.test_spline(spline)
+
+
+def test_incremental_graph_update(shape: Prism) -> None:
+    corners = [Point(x=0, y=0), Point(x=8, y=6)]
+    obstacle = create_obstacle(x=6, y=4, radius=0.3)
+    removed_obstacle = create_obstacle(x=2, y=2, radius=0.8)
+    new_obstacle = create_obstacle(x=4.5, y=1.5, radius=0.8)
+    planner = DelaunayPlanner(shape.outline)
+    planner.update_map([], [obstacle, removed_obstacle], corners, time.time() + 10.0)
+    assert planner.obstacle_map is not None
+    grid = planner.obstacle_map.grid
+    planner.update_map([], [obstacle, new_obstacle], corners, time.time() + 10.0)
+    assert planner.obstacle_map is not None
+    assert planner.obstacle_map.grid is grid, 'the map should be updated instead of recreated'
+    assert planner.tri_points is not None
+    assert planner.graph is not None
+
+    rebuilt_planner = DelaunayPlanner(shape.outline)
+    rebuilt_planner.update_map([], [obstacle, new_obstacle], corners, time.time() + 10.0)
+    assert rebuilt_planner.obstacle_map is not None
+    assert rebuilt_planner.tri_points is not None
+    assert rebuilt_planner.graph is not None
+    assert rebuilt_planner.obstacle_map.grid.bbox == grid.bbox
+    assert np.array_equal(planner.tri_points, rebuilt_planner.tri_points)
+    assert dict(planner.graph.edges) == dict(rebuilt_planner.graph.edges)
+
+
+def test_compact_obstacle_map(shape: Prism) -> None:
+    obstacles = [create_obstacle(x=2, y=1, radius=0.3), create_obstacle(x=4, y=3)]
+    grid = Grid.from_points([Point(x=0, y=0), Point(x=6, y=4)], pixel_size=0.1, num_layers=36, padding=1.0)
+    full = ObstacleMap.from_world(shape.outline, [], obstacles, grid)
+    compact = ObstacleMap.from_world(shape.outline, [], obstacles, grid, compact=True)
+
+    rng = np.random.default_rng(0)
+    x, y, yaw = rng.uniform(-2, 8, 1000), rng.uniform(-2, 6, 1000), rng.uniform(-10, 10, 1000)
+    assert np.array_equal(compact.test(x, y, yaw), full.test(x, y, yaw))
+    assert np.allclose(compact.get_distance(x, y, yaw), full.get_distance(x, y, yaw), atol=0.005)
+
+    spline = Spline.from_poses(Pose(x=0, y=1), Pose(x=3, y=1.5))
+    assert compact.test_spline(spline) == full.test_spline(spline) == True
+
+
+def test_planner_cache(shape: Prism, tmp_path: Path) -> None:
+    obstacle = create_obstacle(x=2, y=1, radius=0.3)
+    corners = [Point(x=0, y=0), Point(x=4, y=3)]
+    planner = DelaunayPlanner(shape.outline, cache_path=tmp_path)
+    planner.update_map([], [obstacle], corners, time.time() + 10.0)
+    planner.wait_for_cache()
+
+    restarted_planner = DelaunayPlanner(shape.outline, cache_path=tmp_path)
+    restarted_planner.update_map([], [obstacle], corners, time.time() + 10.0)
+    assert planner.obstacle_map is not None and planner.obstacle_map.stack is not None
+    assert planner.graph is not None
+    assert restarted_planner.obstacle_map is not None
+    assert restarted_planner.graph is not None
+    assert isinstance(restarted_planner.obstacle_map.stack, np.memmap), 'the map should be loaded from the cache'
+    assert np.array_equal(restarted_planner.obstacle_map.stack, planner.obstacle_map.stack)
+    assert list(restarted_planner.graph.edges(data=True)) == list(planner.graph.edges(data=True))
+    assert restarted_planner.search(Pose(x=0, y=1), Pose(x=4, y=1)) is not None
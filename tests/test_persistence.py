@@ -1,6 +1,15 @@
 from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+import pytest
+from dataclasses_json.core import _asdict
 
 from rosys import persistence
+from rosys.geometry import Point, Pose, Spline
+from rosys.persistence import MsgpackBackend, PersistentModule, registry
+from rosys.persistence.journal import Journal, WriteBatch
+from rosys.vision.detections import SegmentationDetection, Shape
 
 
 @dataclass
@@ -20,6 +29,31 @@ class Model:
     e: int = field(default=0, metadata=persistence.exclude)
 
 
+class Counter(PersistentModule):
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.value = 0
+
+    def backup(self) -> dict[str, Any]:
+        return {'value': self.value}
+
+    def restore(self, data: dict[str, Any]) -> None:
+        self.value = data['value']
+
+
+@pytest.fixture
+def counter(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Counter:
+    monkeypatch.setattr(registry, 'backup_path', tmp_path)
+    monkeypatch.setattr(registry, 'modules', {})
+    monkeypatch.setattr(registry, 'journals', {})
+    monkeypatch.setattr(registry, 'stats', {})
+    monkeypatch.setattr(registry, 'pending_restores', set())
+    counter = Counter()
+    registry.modules['counter'] = counter  # NOTE: modules are not registered automatically in tests
+    return counter
+
+
 def test_conversion_to_and_from_dict() -> None:
     model = Model(
         x=42,
@@ -47,6 +81,16 @@ def test_conversion_to_and_from_dict() -> None:
     assert model_ == model, 'the model should equal the original model (up to excluded fields)'
 
 
+def test_nested_geometry_conversion() -> None:
+    spline = Spline.from_poses(Pose(x=0, y=0), Pose(x=2, y=1, yaw=1.0))
+    segmentation = SegmentationDetection(category_name='weed', model_name='m', confidence=0.5,
+                                         shape=Shape(points=[Point(x=1, y=2), Point(x=3, y=4)]))
+    for obj in [spline, segmentation]:
+        d = persistence.to_dict(obj)
+        assert d == _asdict(obj, False), 'the result should match dataclasses_json'
+        assert persistence.from_dict(type(obj), d) == obj
+
+
 def test_dict_replacement() -> None:
     target = {
         'a': A('foo', True),
@@ -56,3 +100,164 @@ def test_dict_replacement() -> None:
     persistence.replace_dict(target, A, {'c': {'s': 'buz', 'b': False}})
     assert id(target) == target_id, 'target should still be the same object'
     assert target == {'c': A('buz', False)}, 'target content should be completely replaced with new content'
+
+
+def test_journal(tmp_path: Path) -> None:
+    journal = Journal(tmp_path / 'module.json', max_entries=10)
+    data: dict[str, Any] = {'obstacles': {'a': [1, 2], 'b': [3, 4]}, 'days': [1, 2, 3], 'name': 'test', 'padding': 1000 * 'x'}
+    journal.write(data)
+    data['obstacles']['a'] = [5, 6]
+    del data['obstacles']['b']
+    data['days'] = [2, 3]
+    data['name'] = 'changed'
+    journal.write(data)
+    assert journal.entry_count == 6
+    assert Journal(tmp_path / 'module.json').read() == data
+
+    for i in range(5):
+        data['obstacles'][str(i)] = [i, i]
+        journal.write(data)
+    assert journal.entry_count == 0, 'the journal should have been compacted'
+    assert not journal.journal_path.exists()
+    assert Journal(tmp_path / 'module.json').read() == data
+
+
+def test_journal_with_shared_objects(tmp_path: Path) -> None:
+    outline = [1, 2]
+    journal = Journal(tmp_path / 'module.json')
+    journal.write({'obstacles': {'a': {'outline': outline}}, 'padding': 1000 * 'x'})
+    outline.append(3)  # NOTE: backups may share nested objects with the module
+    journal.write({'obstacles': {'a': {'outline': outline}}, 'padding': 1000 * 'x'})
+    assert journal.entry_count == 1
+    assert Journal(tmp_path / 'module.json').read() == {'obstacles': {'a': {'outline': [1, 2, 3]}}, 'padding': 1000 * 'x'}
+
+
+def test_journal_with_torn_line(tmp_path: Path) -> None:
+    data: dict[str, Any] = {'obstacles': {'a': [1, 2]}, 'name': 'test', 'padding': 1000 * 'x'}
+    journal = Journal(tmp_path / 'module.json')
+    journal.write(data)
+    data['name'] = 'changed'
+    journal.write(data)
+    with journal.journal_path.open('a') as f:
+        f.write('{"path": ["name"], "val')  # NOTE: simulate a crash while appending
+
+    journal = Journal(tmp_path / 'module.json')
+    assert journal.read() == data
+    data['obstacles']['b'] = [3, 4]
+    journal.write(data)
+    assert Journal(tmp_path / 'module.json').read() == data, 'the torn line should not swallow the next change'
+
+
+def test_journal_after_crash_during_compaction(tmp_path: Path) -> None:
+    data = {'x': 1, 'padding': 1000 * 'x'}
+    journal = Journal(tmp_path / 'module.json')
+    journal.write(data)
+    data['x'] = 2
+    journal.write(data)
+    batch = WriteBatch()
+    data['x'] = 3
+    journal.write(data, compact=True, batch=batch)
+    outdated_journal = journal.journal_path.read_bytes()
+    batch.commit()
+    journal.journal_path.write_bytes(outdated_journal)  # NOTE: simulate a crash before the journal was deleted
+
+    journal = Journal(tmp_path / 'module.json')
+    assert journal.read() == data, 'the outdated journal should not be replayed on top of the new snapshot'
+    data['x'] = 4
+    journal.write(data)
+    assert Journal(tmp_path / 'module.json').read() == data
+
+
+def test_journal_with_other_backend(tmp_path: Path) -> None:
+    data = {'obstacles': {'a': [1.5, 2.5]}, 'name': 'test'}
+    Journal(tmp_path / 'module.json').write(data)
+
+    journal = Journal(tmp_path / 'module.json', backend=MsgpackBackend())
+    assert journal.read() == data, 'JSON snapshots should still be restored'
+    data['name'] = 'changed'
+    journal.write(data)
+    assert journal.snapshot_path.suffix == '.msgpack'
+    assert Journal(tmp_path / 'module.json', backend=MsgpackBackend()).read() == data
+    assert not (tmp_path / 'module.json').exists(), 'the outdated JSON snapshot should have been removed'
+
+    journal = Journal(tmp_path / 'module.json')
+    assert journal.read() == data, 'switching back should restore the msgpack snapshot'
+    data['name'] = 'changed again'
+    journal.write(data)
+    assert not (tmp_path / 'module.msgpack').exists()
+    assert Journal(tmp_path / 'module.json', backend=MsgpackBackend()).read() == data
+
+
+def test_snapshot_store(tmp_path: Path) -> None:
+    store = persistence.SnapshotStore(tmp_path)
+    day1 = {'module_a': {'value': 1}, 'module_b': {'items': list(range(1000))}}
+    day2 = {'module_a': {'value': 2}, 'module_b': {'items': list(range(1000))}}
+    written = store.save('2024-01-01', day1)
+    assert store.save('2024-01-02', day2) < written, 'unchanged payloads should not be written again'
+    assert store.labels() == ['2024-01-01', '2024-01-02']
+    assert store.load('2024-01-01') == day1
+    assert store.load('2024-01-02') == day2
+
+    store.delete('2024-01-01')
+    assert store.collect_garbage() == 1, 'only the payload of module_a on day 1 is no longer referenced'
+    assert store.load('2024-01-02') == day2
+
+    day3 = {'module_a': {'value': 2}, 'module_b': {'z': 1, 'a': 2}}
+    store.save('2024-01-03', day3)
+    assert list(store.load('2024-01-03')['module_b']) == ['z', 'a'], 'the key order should be preserved'
+
+
+def test_backup_schedule_prunes_legacy_backups(tmp_path: Path) -> None:
+    schedule = persistence.BackupSchedule(tmp_path, backup_count=2)
+    (tmp_path / '2024-01-01.json').write_text('{"module_a": {"value": 1}}')
+    (tmp_path / '2024-01-02.json').write_text('{"module_a": {"value": 2}}')
+    schedule.store.save('2024-01-03', {'module_a': {'value': 3}})
+    assert schedule.labels() == ['2024-01-01', '2024-01-02', '2024-01-03']
+    assert schedule.load('2024-01-02') == {'module_a': {'value': 2}}
+
+    schedule.prune()
+    assert schedule.labels() == ['2024-01-02', '2024-01-03']
+    assert not (tmp_path / '2024-01-01.json').exists()
+
+
+def test_journal_write_batch(tmp_path: Path) -> None:
+    journal = Journal(tmp_path / 'module.json')
+    batch = WriteBatch()
+    assert journal.write({'value': 1}, batch=batch) > 0
+    assert not journal.snapshot_path.exists(), 'the snapshot should only be committed with the batch'
+    batch.commit()
+    assert Journal(tmp_path / 'module.json').read() == {'value': 1}
+
+
+async def test_lazy_restore(counter: Counter, integration: None, monkeypatch: pytest.MonkeyPatch) -> None:
+    Journal(registry.backup_path / 'counter.json').write({'value': 42})
+    monkeypatch.setattr(Counter, 'LAZY_RESTORE', True)
+    await registry.restore()
+    assert 'counter' in registry.pending_restores, 'the lazy module should be restored in the background'
+
+    counter.request_backup()
+    registry._backup(force=False)  # pylint: disable=protected-access
+    assert 'counter' not in registry.stats, 'a module must not be backed up before it has been restored'
+    assert counter.needs_backup
+
+    counter.ensure_restored()
+    assert counter.value == 42
+    assert not registry.pending_restores
+    registry._backup(force=False)  # pylint: disable=protected-access
+    assert registry.stats['counter'].writes == 1
+
+
+def test_backup_interval(counter: Counter, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(Counter, 'BACKUP_INTERVAL', 60.0)
+    counter.request_backup()
+    registry._backup(force=False)  # pylint: disable=protected-access
+    counter.value = 1
+    counter.request_backup()
+    registry._backup(force=False)  # pylint: disable=protected-access
+    assert registry.stats['counter'].writes == 1
+    assert registry.stats['counter'].deferred == 1, 'the second backup should be deferred'
+    assert Journal(registry.backup_path / 'counter.json').read() == {'value': 0}
+
+    registry._backup(force=True)  # pylint: disable=protected-access
+    assert registry.stats['counter'].writes == 2, 'forced backups should ignore the interval'
+    assert Journal(registry.backup_path / 'counter.json').read() == {'value': 1}
@@ -0,0 +1,50 @@
+import asyncio
+import sys
+import threading
+
+import pytest
+
+from rosys import run
+
+
+async def test_executor_priorities_limits_and_deadlines():
+    executor = run.Executor('test executor', workers=1, max_queue=3)
+    blocker = threading.Event()
+    try:
+        order: list[str] = []
+        blocking = asyncio.create_task(executor.submit(blocker.wait))
+        low = asyncio.create_task(executor.submit(order.append, 'low'))
+        high = asyncio.create_task(executor.submit(order.append, 'high', priority=1))
+        expiring = asyncio.create_task(executor.submit(order.append, 'expiring', timeout=0.01))
+        await asyncio.sleep(0.05)
+        assert executor.queue_depth == 2, 'expired work does not count towards the queue limit'
+
+        last = asyncio.create_task(executor.submit(order.append, 'last'))
+        await asyncio.sleep(0)
+        with pytest.raises(run.QueueFullError):
+            await executor.submit(order.append, 'rejected')
+
+        blocker.set()
+        await asyncio.gather(blocking, low, high, last)
+        with pytest.raises(TimeoutError):
+            await expiring
+        assert order == ['high', 'low', 'last']
+        assert executor.stats.expired == 1
+        assert executor.stats.rejected == 1
+        assert executor.stats.completed == 4
+    finally:
+        blocker.set()
+        executor.shutdown()
+    assert 'test executor' not in run.executors, 'the executor should be unregistered'
+
+
+async def test_sh():
+    lines: list[str] = []
+    assert await run.sh('for i in 1 2 3; do echo $i; done', shell=True, on_output=lines.append) == '1\n2\n3\n'
+    assert lines == ['1\n', '2\n', '3\n']
+    lines.clear()
+    assert await run.sh('echo out; echo err >&2', shell=True, on_output=lines.append) == 'out\n'
+    assert sorted(lines) == ['err\n', 'out\n'], 'stderr is streamed as well'
+    assert await run.sh([sys.executable, '-c', 'print("x" * 100000)'], timeout=5) == 100000 * 'x' + '\n'
+    assert await run.sh(['sleep', '5'], timeout=0.1) == ''
+    assert not run.running_sh_processes, 'timed out processes are terminated'
@@ -0,0 +1,96 @@
+import asyncio
+import time
+from multiprocessing.shared_memory import SharedMemory
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from rosys import run, shared_memory
+from rosys.shared_memory import SharedMemoryPool, SharedPayload
+
+
+def _process(data: np.ndarray, raw: bytes) -> np.ndarray:
+    return data * 2 + len(raw)
+
+
+def _slow_process(data: np.ndarray, started: Path) -> np.ndarray:
+    started.touch()
+    time.sleep(0.5)
+    return data * 2
+
+
+def _exists(name: str) -> bool:
+    try:
+        SharedMemory(name=name).close()
+        return True
+    except FileNotFoundError:
+        return False
+
+
+async def test_cpu_bound_shared():
+    data = np.arange(100_000, dtype=np.float64)
+    raw = bytes(200_000)
+    result = await run.cpu_bound_shared(_process, data, raw)
+    assert np.array_equal(result, data * 2 + len(raw))
+    assert await run.cpu_bound_shared(_process, np.ones(3), b'abc') == pytest.approx([5, 5, 5]), \
+        'small payloads should be pickled as usual'
+
+    payload = run.shared_memory_pool.pack(data)
+    run.shared_memory_pool.release(payload.name)
+    assert await run.cpu_bound_shared(_process, data, b'') is not None
+    reused = run.shared_memory_pool.pack(data)
+    assert reused.name == payload.name, 'blocks of completed calls should be reused'
+    run.shared_memory_pool.release(reused.name)
+
+
+async def test_cancelled_cpu_bound_shared(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    discarded: list[SharedPayload] = []
+    discard = shared_memory.discard
+
+    def record_discard(value: SharedPayload) -> None:
+        discarded.append(value)
+        discard(value)
+    monkeypatch.setattr(shared_memory, 'discard', record_discard)
+    data = np.arange(100_000, dtype=np.float64)
+    block = run.shared_memory_pool.pack(data)
+    run.shared_memory_pool.release(block.name)
+    task = asyncio.create_task(run.cpu_bound_shared(_slow_process, data, tmp_path / 'started'))
+    for _ in range(100):
+        if (tmp_path / 'started').exists():
+            break
+        await asyncio.sleep(0.1)
+    task.cancel()
+    assert await task is None
+    for _ in range(50):
+        if discarded:
+            break
+        await asyncio.sleep(0.1)
+    assert len(discarded) == 1 and not _exists(discarded[0].name), 'the result block should be unlinked'
+    reused = run.shared_memory_pool.pack(data)
+    assert reused.name == block.name, 'the argument block should be reused once the worker is done'
+    run.shared_memory_pool.release(reused.name)
+
+
+def test_shared_memory_pool():
+    pool = SharedMemoryPool(max_free_blocks=1)
+    assert pool.pack(b'small') == b'small'
+    first = pool.pack(np.ones(100_000))
+    assert isinstance(first, SharedPayload)
+    pool.release(first.name)
+    second = pool.pack(np.zeros(90_000))
+    assert second.name == first.name, 'payloads of the same size class should reuse the block'
+    third = pool.pack(bytes(90 * 8000))
+    assert third.name != second.name
+
+    pool.release(second.name)
+    pool.release(third.name)
+    assert _exists(second.name)
+    assert not _exists(third.name), 'blocks beyond max_free_blocks should be destroyed'
+
+    fourth = pool.pack(bytes(100_000))
+    pool.release(fourth.name, reuse=False)
+    assert not _exists(fourth.name), 'blocks which might still be in use should not be reused'
+
+    pool.clear()
+    assert not _exists(second.name)
@@ -1,6 +1,7 @@
 import pytest
 
 import rosys
+from rosys import rosys as rosys_module
 from rosys.testing import forward
 
 
@@ -21,6 +22,27 @@ async def test_time():
     assert rosys.uptime() == pytest.approx(5.0, abs=0.1)
 
 
+def test_time_with_changing_simulation_speed(monkeypatch: pytest.MonkeyPatch) -> None:
+    monotonic = 100.0
+    monkeypatch.setattr(rosys_module, 'is_test', False)
+    monkeypatch.setattr(rosys_module.pytime, 'monotonic', lambda: monotonic)
+    monkeypatch.setattr(rosys_module._state, 'time_base', (1000.0, monotonic, 1.0))
+    monkeypatch.setattr(rosys.config, 'simulation_speed', 1.0)
+    monotonic += 2.0
+    assert rosys.time() == pytest.approx(1002.0)
+
+    rosys.config.simulation_speed = 3.0
+    assert rosys.time() == pytest.approx(1002.0), 'time must not jump when the speed changes'
+    monotonic += 2.0
+    assert rosys.time() == pytest.approx(1008.0)
+
+    rosys.config.simulation_speed = 0.5
+    monotonic += 2.0
+    assert rosys.time() == pytest.approx(1014.0), 'the new speed applies from the first call after the change'
+    monotonic += 2.0
+    assert rosys.time() == pytest.approx(1015.0)
+
+
 @pytest.mark.usefixtures('integration')
 async def test_sleep():
     assert rosys.time() == 0.0
@@ -30,3 +52,47 @@ async def test_sleep():
     await forward(1.0)
     assert sleep.done()
     assert rosys.time() == pytest.approx(1.5)
+
+
+@pytest.mark.usefixtures('integration')
+async def test_repeater_keeps_absolute_deadlines():
+    calls: list[float] = []
+    repeater = rosys.on_repeat(lambda: calls.append(rosys.time()), 1.0)
+    await forward(10.5)
+    assert len(calls) in (9, 10, 11)
+    assert all(b - a == pytest.approx(1.0, abs=0.02) for a, b in zip(calls, calls[1:])), 'intervals must not drift'
+    assert repeater.stats.calls == len(calls)
+    repeater.stop()
+
+
+@pytest.mark.parametrize('repetition', [1, 2])
+@pytest.mark.usefixtures('integration')
+async def test_repeater_phases_are_reset_after_test(repetition: int) -> None:  # pylint: disable=unused-argument
+    repeater = rosys.on_repeat(lambda: None, 0.37)
+    assert repeater.phase == pytest.approx(0.37), 'the first repeater of an interval should start after one interval'
+    repeater.stop()
+
+
+@pytest.mark.usefixtures('integration')
+async def test_repeater_skips_missed_ticks():
+    async def slow_handler() -> None:
+        await rosys.sleep(2.5)
+    repeater = rosys.on_repeat(slow_handler, 1.0)
+    await forward(10.0)
+    assert repeater.stats.overruns == repeater.stats.calls > 0
+    assert repeater.stats.skipped >= 2 * repeater.stats.calls - 1
+    repeater.stop()
+
+
+@pytest.mark.usefixtures('integration')
+async def test_forward_jumps_to_sleep_deadlines():
+    wake_up_times: list[float] = []
+
+    async def sleeper(seconds: float) -> None:
+        await rosys.sleep(seconds)
+        wake_up_times.append(rosys.time())
+    rosys.background_tasks.create(sleeper(0.25))
+    rosys.background_tasks.create(sleeper(3600.0))
+    await forward(3600.5)
+    assert wake_up_times == [pytest.approx(0.25, abs=0.01), pytest.approx(3600.0, abs=0.01)]
+    assert rosys.time() == pytest.approx(3600.5)